@@ -12,57 +12,117 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from threading import Lock
+from pathlib import Path
 
-from flask import Flask, render_template, request
+import click
+from flask import Flask, render_template
 
+from .api import api_bp
+from .assets import build_assets, init_assets
+from .cache import bump_generation, render_cache
+from .cards import rebuild_cards
 from .config import Config
+from .credentials import rotate_credentials
+from .dbpool import pool_stats
+from .favicon_cache import cache_stats, clear_cache
+from .health import check_all, health_checker
+from .jobs import favicon_jobs, refresh_favicons
+from .metrics import init_metrics
+from .migrations import run_migrations
 from .models import db
+from .passwords import password_hasher
+from .querystats import init_query_stats
 from .routes import main_bp
+from .search import rebuild_index
+from .startup import init_startup
+from .transfer import detect_format, export_csv, export_ndjson, import_records, iter_records
 from .auth import auth_bp, init_auth
 
 
-# lock to prevent multiple threads from running create_all at the same time on startup
-_schema_lock = Lock()
-
-
 def create_app() -> Flask:
     app = Flask(__name__)
     app.config.from_object(Config)
 
     db.init_app(app)
-    # flag so we only run schema creation once per process lifetime
-    app.extensions["schema_ready"] = False
-
-    @app.before_request
-    def auto_migrate_schema() -> None:
-        # skip if auto migrate is disabled or schema is already set up
-        if not app.config.get("AUTO_MIGRATE", True):
-            return
-        # skip static file requests - no point acquiring the lock for those
-        if request.path.startswith("/static/"):
-            return
-        if app.extensions.get("schema_ready"):
-            return
-        with _schema_lock:
-            # double-check inside the lock in case another thread just finished
-            if app.extensions.get("schema_ready"):
-                return
-            db.create_all()
-            app.extensions["schema_ready"] = True
+    with app.app_context():
+        pool_stats.attach(db.engine)
+    # schema is brought up to date once at startup (see startup.py), not on every request
+    init_startup(app)
+    render_cache.init_app(app)
+    favicon_jobs.init_app(app)
+    password_hasher.init_app(app)
+    health_checker.init_app(app)
 
+    init_metrics(app)
+    init_query_stats(app)
     init_auth(app)
+    init_assets(app)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp)
+
+    @app.cli.command("serve")
+    @click.option("--bind", help="Address to listen on, e.g. 0.0.0.0:5000. Defaults to WEB_BIND.")
+    @click.option("--workers", type=int, help="Worker processes. Defaults to WEB_WORKERS or the cpu count.")
+    @click.option("--threads", type=int, help="Threads per worker. Defaults to WEB_THREADS.")
+    def serve_command(bind: str | None, workers: int | None, threads: int | None) -> None:
+        # production server - use this instead of "flask run" outside of development
+        from .server import serve
+
+        serve(app, bind=bind, workers=workers, threads=threads)
+
+    @app.cli.command("build-assets")
+    @click.option("--out", "out_dir", help="Output directory. Defaults to ASSETS_DIR.")
+    def build_assets_command(out_dir: str | None) -> None:
+        # fingerprint, subset and pre-compress the static assets base.html loads
+        target = Path(out_dir or app.config["ASSETS_DIR"])
+        summary = build_assets(Path(app.static_folder), Path(app.root_path) / app.template_folder, target)
+
+        print(
+            f"Built {summary['files']} asset(s) into {target}: "
+            f"{summary['source_bytes'] // 1024} KB -> {summary['output_bytes'] // 1024} KB, "
+            f"{summary['compressed_bytes'] // 1024} KB compressed. "
+            f"Kept {summary['icons']} Font Awesome icon(s)."
+        )
+        if not summary["subset_fonts"]:
+            print("fontTools/brotli not installed - Font Awesome fonts were copied without subsetting.")
+        if not summary["brotli"]:
+            print("brotli not installed - only gzip variants were written.")
+
+    @app.cli.command("migrate")
+    def migrate() -> None:
+        # apply pending schema migrations - useful if AUTO_MIGRATE is off
+        with app.app_context():
+            applied = run_migrations()
+        if applied:
+            print(f"Applied migrations: {', '.join(str(v) for v in applied)}.")
+        else:
+            print("Schema is up to date.")
 
     @app.cli.command("init-db")
     def init_db() -> None:
-        # manually trigger schema creation - useful if AUTO_MIGRATE is off
+        # kept for existing scripts - same as migrate
         with app.app_context():
-            db.create_all()
+            run_migrations()
         print("Database tables created.")
 
+    @app.cli.command("reindex-search")
+    def reindex_search() -> None:
+        # rebuild every search document from scratch
+        with app.app_context():
+            count = rebuild_index()
+        print(f"Reindexed {count} WebUIs.")
+
+    @app.cli.command("rebuild-dashboard")
+    def rebuild_dashboard() -> None:
+        # rebuild the dashboard read model from scratch, e.g. after editing the database by hand
+        with app.app_context():
+            count = rebuild_cards()
+            # the database was edited by hand, so names may have changed too
+            bump_generation(names=True)
+        print(f"Rebuilt {count} dashboard cards.")
+
     @app.cli.command("create-admin")
     def create_admin() -> None:
         # cli helper to create an admin user without going through the web ui
@@ -71,7 +131,7 @@ def create_app() -> Flask:
         from .models import User
 
         with app.app_context():
-            db.create_all()
+            run_migrations()
 
         username = input("Username: ").strip()
         if not username:
@@ -95,6 +155,115 @@ def create_app() -> Flask:
         db.session.commit()
         print(f"Admin user '{username}' created.")
 
+    @app.cli.command("rotate-credentials-key")
+    @click.option("--old-key", "old_keys", multiple=True,
+                  help="Previous APP_CREDENTIALS_KEY (or SECRET_KEY). Can be given more than once.")
+    @click.option("--batch-size", default=500, show_default=True,
+                  help="Number of rows re-encrypted per commit.")
+    def rotate_credentials_key(old_keys: tuple[str, ...], batch_size: int) -> None:
+        # re-encrypt stored credentials after changing APP_CREDENTIALS_KEY
+        with app.app_context():
+            summary = rotate_credentials(old_keys=old_keys, batch_size=batch_size)
+
+        print(
+            f"Re-encrypted {summary['rotated']} credential(s), "
+            f"{summary['unchanged']} already on the current key."
+        )
+        if summary["failed"]:
+            ids = ", ".join(f"#{webui_id}" for webui_id in summary["failed"])
+            print(f"Could not decrypt {len(summary['failed'])} credential(s) with any given key: {ids}")
+
+    @app.cli.command("check-health")
+    def check_health_command() -> None:
+        # probe every webui now and store the results, same as one background sweep
+        summary = check_all(app)
+        print(
+            f"Checked {summary['total']} WebUI(s) in {summary['elapsed']:.1f}s: "
+            f"{summary['up']} up, {summary['down']} down, {summary['changed']} changed."
+        )
+
+    @app.cli.command("import-webuis")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+    @click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]),
+                  help="File format. Defaults to csv for .csv files and ndjson otherwise.")
+    @click.option("--batch-size", default=200, show_default=True,
+                  help="Number of records written per commit.")
+    @click.option("--skip-favicons", is_flag=True,
+                  help="Don't fetch favicons for the imported WebUIs afterwards.")
+    def import_webuis_command(path: str, fmt: str | None, batch_size: int, skip_favicons: bool) -> None:
+        # bulk upsert webuis (plus hosts and categories) from an ndjson or csv file
+        with click.open_file(path, encoding="utf-8-sig") as stream, app.app_context():
+            summary = import_records(iter_records(stream, fmt or detect_format(path)), batch_size=batch_size)
+
+        print(
+            f"Imported {summary['created']} new and {summary['updated']} updated WebUI(s); "
+            f"new hosts: {summary['hosts_created']}, new categories: {summary['categories_created']}."
+        )
+        for line_no, error in summary["errors"]:
+            print(f"  line {line_no}: {error}")
+
+        if summary["favicon_ids"] and not skip_favicons:
+            # the cli has no background queue to hand off to, so fetch them in bulk now
+            result = refresh_favicons(app)
+            print(f"Resolved {result['resolved']}/{result['total']} favicon(s).")
+
+    @app.cli.command("export-webuis")
+    @click.argument("path", default="-")
+    @click.option("--format", "fmt", type=click.Choice(["ndjson", "csv"]),
+                  help="File format. Defaults to csv for .csv files and ndjson otherwise.")
+    def export_webuis_command(path: str, fmt: str | None) -> None:
+        # stream every webui to a file (or stdout) - passwords stay encrypted
+        fmt = fmt or detect_format(path)
+        with click.open_file(path, "w", encoding="utf-8") as out, app.app_context():
+            for chunk in export_csv() if fmt == "csv" else export_ndjson():
+                out.write(chunk)
+        if path != "-":
+            print(f"Exported to {path}.")
+
+    @app.cli.command("refresh-favicons")
+    @click.option("--all", "refresh_all", is_flag=True,
+                  help="Re-resolve every WebUI, not just missing or stale icons.")
+    @click.option("--concurrency", default=8, show_default=True,
+                  help="Number of WebUIs resolved at the same time.")
+    @click.option("--per-host", default=2, show_default=True,
+                  help="Max concurrent resolutions against a single host.")
+    @click.option("--batch-size", default=50, show_default=True,
+                  help="Number of results written per commit.")
+    @click.option("--ignore-cache", is_flag=True,
+                  help="Resolve again even if a page has a cached icon or its origin is backing off.")
+    def refresh_favicons_command(refresh_all: bool, concurrency: int, per_host: int, batch_size: int,
+                                 ignore_cache: bool) -> None:
+        # bulk re-resolve favicons after an outage or a big import
+        summary = refresh_favicons(app, refresh_all=refresh_all, concurrency=concurrency,
+                                   per_host=per_host, batch_size=batch_size, ignore_cache=ignore_cache)
+
+        for webui_id, url, reason in summary["failures"]:
+            print(f"  failed: #{webui_id} {url} ({reason})")
+        print(
+            f"Refreshed {summary['resolved']}/{summary['total']} favicons "
+            f"in {summary['elapsed']:.1f}s ({summary['rate']:.1f}/s), "
+            f"{summary['failed']} failed."
+        )
+
+    @app.cli.command("favicon-cache")
+    @click.option("--clear", is_flag=True, help="Forget every cached page and origin.")
+    @click.option("--clear-failing", is_flag=True, help="Forget only pages and origins that are backing off.")
+    def favicon_cache_command(clear: bool, clear_failing: bool) -> None:
+        # show (or reset) the favicon resolution cache
+        with app.app_context():
+            if clear or clear_failing:
+                count = clear_cache(failing_only=not clear)
+                print(f"Forgot {count} cached entr{'y' if count == 1 else 'ies'}.")
+                return
+            stats = cache_stats()
+
+        print(
+            f"{stats['total']} cached page(s) and origin(s): {stats['good']} with an icon, "
+            f"{stats['backing_off']} backing off, {stats['expired']} due for re-resolution."
+        )
+        for origin, failures, retry_at in stats["failing"]:
+            print(f"  {origin}: {failures} failure(s), next try {retry_at:%Y-%m-%d %H:%M} UTC")
+
 ################
 # error handlers
 ################
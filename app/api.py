@@ -0,0 +1,221 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import binascii
+import json
+from functools import wraps
+
+from flask import Blueprint, g, jsonify, request, url_for
+from sqlalchemy import and_, func, or_
+
+from .auth import bootstrap_required
+from .dbpool import pool_stats
+from .favicons import favicon_src
+from .models import Category, Host, WebUI, WebUIHealth, WebUISearch, db, webui_categories
+from .search import search_filter
+from .suggest import suggest_index
+
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+DEFAULT_SUGGESTIONS = 8
+MAX_SUGGESTIONS = 20
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def api_login_required(view):
+    # same gate as login_required, but answers with json instead of redirecting to the login page
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if bootstrap_required() or g.user is None:
+            return jsonify({"error": "Authentication required."}), 401
+        try:
+            return view(*args, **kwargs)
+        except _BadRequest as exc:
+            return jsonify({"error": str(exc)}), 400
+
+    return wrapped
+
+
+def _encode_cursor(name: str, row_id: int) -> str:
+    raw = json.dumps([name, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    # cursors are opaque to clients - base64 of the (name, id) of the last row on the previous page
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(name, str) or not isinstance(row_id, int):
+            raise ValueError
+        return name, row_id
+    except (ValueError, TypeError, binascii.Error):
+        raise _BadRequest("Invalid cursor.")
+
+
+def _page_params() -> tuple[int, tuple[str, int] | None]:
+    limit = request.args.get("limit", DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_LIMIT))
+    cursor = request.args.get("cursor")
+    return limit, _decode_cursor(cursor) if cursor else None
+
+
+def _paginate(stmt, name_column, id_column):
+    # keyset pagination on (name, id) - each page is an index range scan no matter how deep it is
+    limit, after = _page_params()
+    if after is not None:
+        last_name, last_id = after
+        stmt = stmt.where(or_(
+            name_column > last_name,
+            and_(name_column == last_name, id_column > last_id),
+        ))
+
+    # fetch one extra row to find out whether there's another page without a count query
+    rows = db.session.execute(
+        stmt.order_by(name_column.asc(), id_column.asc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].name, rows[-1].id)
+    return rows, next_cursor
+
+
+@api_bp.route("/webuis")
+@api_login_required
+def list_webuis():
+    q = (request.args.get("q") or "").strip()
+    host_id = request.args.get("host_id", type=int)
+    category_id = request.args.get("category_id", type=int)
+
+    # project just the columns we return, never full orm objects
+    stmt = db.select(
+        WebUI.id,
+        WebUI.name,
+        WebUI.url,
+        WebUI.description,
+        WebUI.favicon_url,
+        WebUI.host_id,
+        Host.name.label("host_name"),
+        or_(
+            WebUI.credential_password_encrypted.is_not(None),
+            func.coalesce(WebUI.credential_username, "") != "",
+        ).label("has_credentials"),
+        WebUIHealth.up.label("health_up"),
+        WebUIHealth.status_code.label("health_status_code"),
+        WebUIHealth.latency_ms.label("health_latency_ms"),
+        WebUIHealth.checked_at.label("health_checked_at"),
+    ).outerjoin(Host, Host.id == WebUI.host_id).outerjoin(WebUIHealth, WebUIHealth.webui_id == WebUI.id)
+
+    if q:
+        match, _ = search_filter(q)
+        stmt = stmt.join(WebUISearch, WebUISearch.webui_id ==
+                         WebUI.id).where(match)
+    if host_id:
+        stmt = stmt.where(WebUI.host_id == host_id)
+    if category_id:
+        stmt = stmt.where(WebUI.id.in_(
+            db.select(webui_categories.c.webui_id).where(
+                webui_categories.c.category_id == category_id)
+        ))
+
+    rows, next_cursor = _paginate(stmt, WebUI.name, WebUI.id)
+
+    # one extra query for the categories of this page only
+    categories = {}
+    if rows:
+        category_rows = db.session.execute(
+            db.select(webui_categories.c.webui_id, Category.id, Category.name)
+            .join(Category, Category.id == webui_categories.c.category_id)
+            .where(webui_categories.c.webui_id.in_([row.id for row in rows]))
+            .order_by(Category.name.asc())
+        ).all()
+        for webui_id, cat_id, cat_name in category_rows:
+            categories.setdefault(webui_id, []).append(
+                {"id": cat_id, "name": cat_name})
+
+    return jsonify({
+        "items": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "url": row.url,
+                "description": row.description or "",
+                "favicon_url": favicon_src(row.favicon_url),
+                "host": {"id": row.host_id, "name": row.host_name} if row.host_id else None,
+                "categories": categories.get(row.id, []),
+                "has_credentials": bool(row.has_credentials),
+                "health": {
+                    "up": row.health_up,
+                    "status_code": row.health_status_code,
+                    "latency_ms": row.health_latency_ms,
+                    "checked_at": row.health_checked_at.isoformat() + "Z",
+                } if row.health_checked_at else None,
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+@api_bp.route("/suggest")
+@api_login_required
+def suggest():
+    # search-as-you-type for the dashboard, answered from the in-memory index without touching the database
+    q = (request.args.get("q") or "").strip()
+    limit = request.args.get("limit", DEFAULT_SUGGESTIONS, type=int)
+    items = suggest_index.search(q, max(1, min(limit, MAX_SUGGESTIONS)))
+    for item in items:
+        if item["type"] == "host":
+            item["href"] = url_for("main.webui_list", host_id=item["id"])
+        elif item["type"] == "category":
+            item["href"] = url_for("main.webui_list", category_id=item["id"])
+        else:
+            item["href"] = item["url"]
+    return jsonify({"items": items})
+
+
+@api_bp.route("/hosts")
+@api_login_required
+def list_hosts():
+    rows, next_cursor = _paginate(
+        db.select(Host.id, Host.name, Host.description), Host.name, Host.id)
+    return jsonify({
+        "items": [{"id": row.id, "name": row.name, "description": row.description or ""} for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+
+@api_bp.route("/categories")
+@api_login_required
+def list_categories():
+    rows, next_cursor = _paginate(
+        db.select(Category.id, Category.name, Category.description), Category.name, Category.id)
+    return jsonify({
+        "items": [{"id": row.id, "name": row.name, "description": row.description or ""} for row in rows],
+        "next_cursor": next_cursor,
+    })
+
+
+@api_bp.route("/pool")
+@api_login_required
+def pool_status():
+    # database connection pool telemetry for this worker process
+    return jsonify(pool_stats.snapshot(db.engine))
@@ -0,0 +1,314 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+from io import BytesIO
+from pathlib import Path
+
+from flask import Blueprint, Flask, abort, current_app, request, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional - without it only gzip variants are written
+    brotli = None
+
+
+assets_bp = Blueprint("assets", __name__)
+
+FONTAWESOME_CSS = "fontawesome-free-7.1.0-web/css/all.min.css"
+# everything base.html pulls in - fonts and anything else they reference via url() are picked up from the css
+ASSET_ENTRIES = (
+    "images/favicon.ico",
+    FONTAWESOME_CSS,
+    "css/tailwind.css",
+    "css/app.css",
+    "js/app.js",
+)
+MANIFEST_NAME = "manifest.json"
+
+# woff2, jpg and png are compressed already - recompressing them only costs cpu
+_COMPRESSIBLE = {".css", ".js", ".svg", ".ico", ".ttf", ".otf", ".json", ".txt"}
+_HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[A-Za-z0-9]+$")
+_ICON_RE = re.compile(r"(?<![\w-])fa-[a-z0-9]+(?:-[a-z0-9]+)*")
+_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+# the glyph is either a hex escape ("\f015") or a single, possibly escaped, character ("A", "\+")
+_ICON_RULE_RE = re.compile(r'^((?:\.fa-[a-z0-9-]+,)*\.fa-[a-z0-9-]+)\{--fa:"(\\[0-9a-f]{2,6}|\\?.)"\}$')
+_FONT_FAMILY_RE = re.compile(r'font-family:"([^"]+)"')
+
+# font awesome style classes -> the webfont they need
+_STYLE_FONTS = {
+    "fa-solid": "fa-solid-900.woff2",
+    "fa-regular": "fa-regular-400.woff2",
+    "fa-brands": "fa-brands-400.woff2",
+}
+
+
+# ---- build ----
+
+def used_icons(template_dir: Path, static_dir: Path) -> set[str]:
+    # every fa-* token in the templates and scripts - class names built at runtime must appear literally somewhere
+    icons = set()
+    sources = list(template_dir.rglob("*.html")) + list((static_dir / "js").rglob("*.js"))
+    for path in sources:
+        icons.update(_ICON_RE.findall(path.read_text(encoding="utf-8-sig")))
+    return icons
+
+
+def _split_rules(css: str) -> list[str]:
+    # top level rules and comments of a minified stylesheet, nested blocks (@media, @keyframes) kept whole
+    rules = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(css):
+        if depth == 0 and css.startswith("/*", i):
+            end = css.find("*/", i) + 2
+            rules.append(css[i:end])
+            i = start = end
+            continue
+        char = css[i]
+        if char == '"':
+            i = css.find('"', i + 1) + 1
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:i + 1].strip())
+                start = i + 1
+        i += 1
+    return [rule for rule in rules if rule]
+
+
+def subset_fontawesome(css: str, icons: set[str]) -> tuple[str, set[str], set[int]]:
+    # drops icon rules nobody uses, plus the v4/v5 compatibility font faces
+    # returns the css, the webfont files it still needs and the codepoints to keep in them
+    fonts = {font for style, font in _STYLE_FONTS.items() if style in icons}
+    if icons & {"fa", "fas"}:
+        fonts.add(_STYLE_FONTS["fa-solid"])
+
+    kept = []
+    codepoints = set()
+    for rule in _split_rules(css):
+        match = _ICON_RULE_RE.match(rule)
+        if match:
+            selectors = [s for s in match.group(1).split(",") if s[1:] in icons]
+            if selectors:
+                glyph = match.group(2)
+                kept.append(f'{",".join(selectors)}{{--fa:"{glyph}"}}')
+                codepoints.add(int(glyph[1:], 16) if len(glyph) > 2 else ord(glyph[-1]))
+            continue
+        if rule.startswith("@font-face"):
+            family = _FONT_FAMILY_RE.search(rule)
+            if not family or not family.group(1).startswith("Font Awesome 7"):
+                continue
+            if not any(font in rule for font in fonts):
+                continue
+        kept.append(rule)
+    return "".join(kept), fonts, codepoints
+
+
+def _subset_font(data: bytes, codepoints: set[int]) -> bytes | None:
+    # fontTools (and brotli for woff2 output) are optional - without them the full font is shipped
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        return None
+    if brotli is None:
+        return None
+
+    font = TTFont(BytesIO(data))
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    out = BytesIO()
+    font.flavor = "woff2"
+    font.save(out)
+    return out.getvalue()
+
+
+class _Builder:
+    def __init__(self, static_dir: Path, out_dir: Path, icons: set[str]):
+        self.static_dir = static_dir
+        self.out_dir = out_dir
+        self.icons = icons
+        self.manifest = {}
+        self.fonts = set()
+        self.codepoints = set()
+        self.subset_fonts = 0
+        self.source_bytes = 0
+        self.output_bytes = 0
+        self.compressed_bytes = 0
+
+    def build(self, logical: str) -> str:
+        # returns the hashed path relative to the output dir, building dependencies first
+        if logical in self.manifest:
+            return self.manifest[logical]
+
+        data = (self.static_dir / logical).read_bytes()
+        self.source_bytes += len(data)
+        suffix = posixpath.splitext(logical)[1].lower()
+
+        if logical == FONTAWESOME_CSS:
+            css, self.fonts, self.codepoints = subset_fontawesome(data.decode("utf-8"), self.icons)
+            data = css.encode("utf-8")
+        elif posixpath.basename(logical) in self.fonts and self.codepoints:
+            subset = _subset_font(data, self.codepoints)
+            if subset is not None:
+                data = subset
+                self.subset_fonts += 1
+
+        if suffix == ".css":
+            data = self._rewrite_urls(logical, data.decode("utf-8-sig")).encode("utf-8")
+
+        # hash the final bytes, so a css file's name changes whenever a font it points at does
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = posixpath.splitext(logical)
+        hashed = f"{stem}.{digest}{ext}"
+        self._write(hashed, data, suffix)
+        self.manifest[logical] = hashed
+        return hashed
+
+    def _rewrite_urls(self, logical: str, css: str) -> str:
+        base = posixpath.dirname(logical)
+
+        def replace(match):
+            url = match.group(2).strip()
+            if url.startswith(("data:", "http:", "https:", "//", "/", "#")):
+                return match.group(0)
+            path, _, fragment = url.partition("#")
+            path = path.split("?", 1)[0]
+            target = posixpath.normpath(posixpath.join(base, path))
+            if not (self.static_dir / target).is_file():
+                return match.group(0)
+            # css that got trimmed away no longer references some fonts, so only build what's left
+            hashed = self.build(target)
+            relative = posixpath.relpath(hashed, base or ".")
+            return f'url("{relative}{"#" + fragment if fragment else ""}")'
+
+        return _URL_RE.sub(replace, css)
+
+    def _write(self, hashed: str, data: bytes, suffix: str) -> None:
+        target = self.out_dir / hashed
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        self.output_bytes += len(data)
+        if suffix not in _COMPRESSIBLE:
+            self.compressed_bytes += len(data)
+            return
+
+        # mtime=0 keeps the gzip output byte-for-byte reproducible
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data, quality=11)))
+        smallest = len(data)
+        for extension, compressed in variants:
+            if len(compressed) < len(data):
+                target.with_name(target.name + extension).write_bytes(compressed)
+                smallest = min(smallest, len(compressed))
+        self.compressed_bytes += smallest
+
+
+def build_assets(static_dir: Path, template_dir: Path, out_dir: Path) -> dict:
+    # writes fingerprinted copies of the entry assets plus a manifest mapping logical -> hashed names
+    if out_dir.exists() and any(out_dir.iterdir()) and not (out_dir / MANIFEST_NAME).exists():
+        raise RuntimeError(f"{out_dir} is not empty and has no {MANIFEST_NAME}, refusing to replace it")
+
+    icons = used_icons(template_dir, static_dir)
+    staging = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    builder = _Builder(static_dir, staging, icons)
+    for logical in ASSET_ENTRIES:
+        builder.build(logical)
+    (staging / MANIFEST_NAME).write_text(json.dumps(builder.manifest, indent=2, sort_keys=True))
+
+    # swap the finished build in so a running server never sees a half written directory
+    shutil.rmtree(out_dir, ignore_errors=True)
+    staging.rename(out_dir)
+    return {
+        "files": len(builder.manifest),
+        "icons": len(builder.codepoints),
+        "subset_fonts": builder.subset_fonts,
+        "source_bytes": builder.source_bytes,
+        "output_bytes": builder.output_bytes,
+        "compressed_bytes": builder.compressed_bytes,
+        "brotli": brotli is not None,
+    }
+
+
+# ---- serving ----
+
+def _load_manifest(assets_dir: Path) -> dict:
+    try:
+        return json.loads((assets_dir / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(filename: str) -> str:
+    # fingerprinted url when build-assets has been run, the plain static file otherwise (development)
+    hashed = current_app.extensions["asset_manifest"].get(filename)
+    if hashed is None:
+        return url_for("static", filename=filename)
+    return url_for("assets.asset_file", filename=hashed)
+
+
+@assets_bp.route("/assets/<path:filename>")
+def asset_file(filename: str):
+    # names carry a content hash, so a given url never changes and can be cached forever
+    if not _HASHED_NAME_RE.search(filename):
+        abort(404)
+    path = safe_join(current_app.config["ASSETS_DIR"], filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if filename.endswith(".woff2"):
+        mimetype = "font/woff2"
+
+    encoding = None
+    for candidate, extension in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[candidate] and os.path.isfile(path + extension):
+            encoding, path = candidate, path + extension
+            break
+
+    response = send_file(path, mimetype=mimetype, max_age=31536000, conditional=True)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app: Flask) -> None:
+    # the manifest is read once per process - restart after running build-assets
+    app.extensions["asset_manifest"] = _load_manifest(Path(app.config["ASSETS_DIR"]))
+    app.add_template_global(asset_url)
+    app.register_blueprint(assets_bp)
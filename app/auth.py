@@ -12,27 +12,85 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
+from dataclasses import dataclass
 from functools import wraps
+from threading import Lock
 
-from flask import Blueprint, flash, g, redirect, render_template, request, session, url_for
-from sqlalchemy import func
+from flask import Blueprint, current_app, flash, g, redirect, render_template, request, session, url_for
+from sqlalchemy import event, func
 from sqlalchemy.exc import IntegrityError
 
 from .models import User, db
+from .passwords import HasherBusy
 
 
 auth_bp = Blueprint("auth", __name__)
 
 
+@dataclass(frozen=True)
+class SessionUser:
+    # what g.user holds - a detached snapshot that's safe to share between requests
+    id: int
+    username: str
+
+
+# once any user exists the app can never need first-run setup again, so this only flips false -> true
+_users_exist = False
+
+# user_id -> (SessionUser or None, expires at) - None caches "no such user" too
+_user_cache = {}
+_user_cache_lock = Lock()
+
+
+def mark_users_exist() -> None:
+    global _users_exist
+    _users_exist = True
+
+
+def forget_user(user_id: int) -> None:
+    # drop the cached snapshot so the next request reloads the row
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target) -> None:
+    # covers password changes and deletes from anywhere in this process
+    forget_user(target.id)
+
+
 def bootstrap_required() -> bool:
     # check if any users exist - if not, we need the first-run setup
+    if _users_exist:
+        return False
     # cached on g so we dont hit the db more than once per request
     if "bootstrap_required" not in g:
         g.bootstrap_required = db.session.scalar(
             db.select(func.count()).select_from(User)) == 0
+        if not g.bootstrap_required:
+            mark_users_exist()
     return g.bootstrap_required
 
 
+def _load_session_user(user_id: int) -> SessionUser | None:
+    # short ttl cache in front of the user lookup so a normal page view costs no auth queries
+    ttl = current_app.config["AUTH_CACHE_TTL"]
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+    if entry is not None and entry[1] > now:
+        return entry[0]
+
+    user = db.session.get(User, user_id)
+    snapshot = SessionUser(id=user.id, username=user.username) if user else None
+    if ttl > 0:
+        with _user_cache_lock:
+            _user_cache[user_id] = (snapshot, now + ttl)
+    return snapshot
+
+
 def login_required(view):
     # decorator that redirects to setup if no users exist, or login if not authenticated
     @wraps(view)
@@ -46,12 +104,24 @@ def login_required(view):
     return wrapped
 
 
+def fragment_login_required(view):
+    # for html fragments fetched by script - a redirect would be followed and the login page injected
+    # into the page, so answer 401 and let the script send the user to log in
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if bootstrap_required() or g.user is None:
+            return "", 401
+        return view(*args, **kwargs)
+
+    return wrapped
+
+
 def init_auth(app):
     @app.before_request
     def load_user():
-        # pull the user id out of the session and fetch the full user object each request
+        # pull the user id out of the session and resolve it through the ttl cache
         user_id = session.get("user_id")
-        g.user = db.session.get(User, user_id) if user_id else None
+        g.user = _load_session_user(user_id) if user_id else None
 
     @app.context_processor
     def inject_auth_user():
@@ -74,7 +144,17 @@ def login():
 
         user = db.session.scalar(
             db.select(User).where(User.username == username))
-        if user and user.check_password(password):
+        try:
+            verified = user is not None and user.check_password(password)
+            # the plaintext is only around now, so this is the one chance to move to the current hash profile
+            if verified and user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+        except HasherBusy:
+            flash("Too many sign-in attempts right now, try again in a moment.", "error")
+            return render_template("login.html"), 503
+
+        if verified:
             session.clear()
             session["user_id"] = user.id
 
@@ -110,7 +190,11 @@ def setup_admin():
             flash("Passwords do not match.", "error")
         else:
             user = User(username=username)
-            user.set_password(password)
+            try:
+                user.set_password(password)
+            except HasherBusy:
+                flash("The server is busy, try again in a moment.", "error")
+                return render_template("setup_admin.html"), 503
             db.session.add(user)
             try:
                 db.session.commit()
@@ -119,6 +203,7 @@ def setup_admin():
                 db.session.rollback()
                 flash("That username is already in use.", "error")
             else:
+                mark_users_exist()
                 session.clear()
                 session["user_id"] = user.id
                 flash("Admin account created.", "success")
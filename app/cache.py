@@ -0,0 +1,265 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from threading import Lock
+from typing import Hashable, Optional
+
+try:
+    import fcntl
+except ImportError:  # windows - only the dev server runs there, and that's a single process
+    fcntl = None
+
+from flask import Flask, Response, current_app, g, make_response, request, session
+from sqlalchemy import func
+
+from .models import Category, Host, WebUI, db
+
+
+class RenderCache:
+    # small in-process lru for rendered html, capped by entry count and total size
+
+    def __init__(self):
+        self.max_entries = 0
+        self.max_bytes = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.max_entries = app.config["RENDER_CACHE_ENTRIES"]
+        self.max_bytes = app.config["RENDER_CACHE_MAX_BYTES"]
+        app.extensions["render_cache"] = self
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        # zero entries means caching is turned off, and a single oversized page is never worth keeping
+        if self.max_entries <= 0 or len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+render_cache = RenderCache()
+
+
+class SharedStamp:
+    # a file whose mtime is bumped after a write, so writes in one worker (or a cli command) are seen by
+    # every other process - reading it costs a stat
+    # the values this process wrote are kept, keyed by the value each one replaced, so in-memory indexes
+    # that the write routes keep up to date can tell their own process's writes apart from everyone else's
+
+    OWN_KEPT = 256
+
+    def __init__(self, name: str):
+        self.name = name
+        self._own = OrderedDict()
+        self._lock = Lock()
+
+    def path(self) -> Path:
+        return Path(current_app.config["DATA_DIR"]) / self.name
+
+    def mtime_ns(self) -> int:
+        try:
+            return self.path().stat().st_mtime_ns
+        except OSError:
+            return 0
+
+    def bump(self) -> None:
+        path = self.path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                # read, bump and record under an exclusive lock, so a bump made by another process in
+                # between can never be taken for one of ours
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                previous = os.fstat(fd).st_mtime_ns
+                # set the mtime explicitly so two bumps in the same clock tick still differ
+                now = max(time.time_ns(), previous + 1)
+                # recorded before the file changes, so a lookup in this process never sees it as foreign
+                with self._lock:
+                    self._own[previous] = now
+                    while len(self._own) > self.OWN_KEPT:
+                        self._own.popitem(last=False)
+                os.utime(path, ns=(now, now))
+            finally:
+                # closing drops the lock
+                os.close(fd)
+        except OSError:
+            # read-only data dir - in-process counters still cover this process
+            current_app.logger.warning("could not update %s stamp %s", self.name, path)
+
+    def changed_elsewhere(self, since: int) -> tuple[bool, int]:
+        # whether another process bumped the stamp after the value `since`,
+        # and the current value to compare against next time
+        current = self.mtime_ns()
+        seen = since
+        while seen != current:
+            seen = self._own.get(seen)
+            if seen is None:
+                return True, current
+        return False, current
+
+
+# anything the dashboard shows
+generation_stamp = SharedStamp("generation")
+# names, urls, hosts and categories only - what the suggestion index is built from
+names_stamp = SharedStamp("names")
+
+# bumped on every write in this process
+_local_generation = 0
+_generation_lock = Lock()
+
+
+def _stamp_mtime_ns() -> int:
+    return generation_stamp.mtime_ns()
+
+
+def current_generation() -> tuple:
+    # a stat is all it costs to find out whether anything changed since the cached render
+    return _local_generation, _stamp_mtime_ns()
+
+
+def shared_generation() -> tuple:
+    # the part of the generation every worker agrees on, for validators a client may send to any of them
+    # the per-process counter only stands in when there is no stamp file to share
+    stamp = _stamp_mtime_ns()
+    return ("stamp", stamp) if stamp else ("local", _local_generation)
+
+
+def bump_generation(names: bool = False) -> None:
+    # call after committing any change that shows up on the dashboard
+    # names=True when it also changed a webui name or url, a host or a category, so other processes'
+    # suggestion indexes rebuild - favicon and health writes leave it alone
+    global _local_generation
+    with _generation_lock:
+        _local_generation += 1
+    render_cache.clear()
+
+    generation_stamp.bump()
+    if names:
+        names_stamp.bump()
+
+
+def _page_validator() -> tuple[str, Optional[datetime]]:
+    # one aggregate round trip - newest webui change plus row counts so deletes show up too
+    # host/category renames don't touch updated_at, the generation covers those
+    latest, webuis, hosts, categories = db.session.execute(db.select(
+        db.select(func.max(WebUI.updated_at)).scalar_subquery(),
+        db.select(func.count()).select_from(WebUI).scalar_subquery(),
+        db.select(func.count()).select_from(Host).scalar_subquery(),
+        db.select(func.count()).select_from(Category).scalar_subquery(),
+    )).one()
+
+    user = g.get("user")
+    parts = (
+        request.full_path,
+        user.id if user is not None else None,
+        shared_generation(),
+        latest.isoformat() if latest else "",
+        webuis,
+        hosts,
+        categories,
+    )
+    etag = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    # timestamps are stored as naive utc
+    candidates = []
+    if latest is not None:
+        candidates.append(latest.replace(tzinfo=timezone.utc))
+    stamp = _stamp_mtime_ns()
+    if stamp:
+        candidates.append(datetime.fromtimestamp(stamp / 1e9, tz=timezone.utc))
+    last_modified = max(candidates) if candidates else None
+    return etag, last_modified
+
+
+def _fragment_validator() -> tuple[str, Optional[datetime]]:
+    # for fragments that only change on writes that bump the generation - no database round trip,
+    # so a dashboard fetching one fragment per host group doesn't rescan the tables for each of them
+    user = g.get("user")
+    parts = (request.full_path, user.id if user is not None else None, shared_generation())
+    etag = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+    stamp = _stamp_mtime_ns()
+    last_modified = datetime.fromtimestamp(stamp / 1e9, tz=timezone.utc) if stamp else None
+    return etag, last_modified
+
+
+def conditional_page(view):
+    # answers GET revalidations with a 304 before the view loads or renders anything
+    # goes under login_required so unauthenticated requests never get as far as the validator
+    return _conditional(view, _page_validator)
+
+
+def conditional_fragment(view):
+    # same as conditional_page, validated on the generation alone
+    return _conditional(view, _fragment_validator)
+
+
+def _conditional(view, validator):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        # pending flash messages are part of the page, so those renders can't be skipped
+        if request.method != "GET" or "_flashes" in session:
+            return view(*args, **kwargs)
+
+        etag, last_modified = validator()
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = (
+                last_modified is not None
+                and request.if_modified_since is not None
+                and last_modified.replace(microsecond=0) <= request.if_modified_since
+            )
+
+        response = Response(status=304) if not_modified else make_response(
+            view(*args, **kwargs))
+        if response.status_code in (200, 304):
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # always revalidate, and never let a shared cache hand one user's page to another
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        return response
+
+    return wrapped
@@ -0,0 +1,175 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import DashboardCard, WebUI, WebUIHealth, db, webui_categories
+
+
+_card_table = DashboardCard.__table__
+
+# a card with no health result yet
+_NO_HEALTH = {
+    "health_up": None,
+    "health_status_code": None,
+    "health_latency_ms": None,
+    "health_error": None,
+    "health_last_up_at": None,
+}
+
+# plain executemany updates - rows deleted since the caller read them are skipped instead of raising
+_set_health = _card_table.update().where(_card_table.c.webui_id == bindparam("card_id")).values(
+    {column: bindparam(column) for column in _NO_HEALTH})
+_set_favicon = _card_table.update().where(_card_table.c.webui_id == bindparam("card_id")).values(
+    favicon_url=bindparam("favicon_url"))
+
+
+def _card_values(webui: WebUI) -> dict:
+    # everything but health, which only the health checker writes
+    # goes through the relationships, host_id isn't set until the next flush after an edit
+    categories = sorted(webui.categories, key=lambda category: category.name.lower())
+    return {
+        "webui_id": webui.id,
+        "host_id": webui.host.id if webui.host is not None else None,
+        "host_name": webui.host.name if webui.host is not None else None,
+        "name": webui.name,
+        "url": webui.url,
+        "description": webui.description,
+        "favicon_url": webui.favicon_url,
+        "has_credentials": bool(webui.credential_username or webui.credential_password_encrypted),
+        "categories": json.dumps([[category.id, category.name] for category in categories],
+                                 ensure_ascii=False, separators=(",", ":")),
+    }
+
+
+def _health_values(webui_ids: list[int]) -> dict:
+    # only needed for cards created after their webui was already probed (backfill, repair)
+    return {
+        row.webui_id: {
+            "health_up": row.up,
+            "health_status_code": row.status_code,
+            "health_latency_ms": row.latency_ms,
+            "health_error": row.error,
+            "health_last_up_at": row.last_up_at,
+        }
+        for row in db.session.execute(db.select(WebUIHealth).where(WebUIHealth.webui_id.in_(webui_ids))).scalars()
+    }
+
+
+def refresh_cards(webuis) -> None:
+    # upsert the dashboard rows for these webuis in the current transaction - caller commits
+    # new webuis need an id, so flush first when there are any
+    if any(webui.id is None for webui in webuis):
+        db.session.flush()
+    if not webuis:
+        return
+
+    rows = [_card_values(webui) for webui in webuis]
+    existing = set(db.session.scalars(
+        db.select(DashboardCard.webui_id).where(DashboardCard.webui_id.in_([row["webui_id"] for row in rows]))))
+    inserts = [row for row in rows if row["webui_id"] not in existing]
+    updates = [row for row in rows if row["webui_id"] in existing]
+    if inserts:
+        health = _health_values([row["webui_id"] for row in inserts])
+        for row in inserts:
+            row.update(health.get(row["webui_id"], _NO_HEALTH))
+        db.session.execute(db.insert(DashboardCard), inserts)
+    if updates:
+        db.session.execute(db.update(DashboardCard), updates)
+
+
+def refresh_card(webui: WebUI) -> None:
+    refresh_cards([webui])
+
+
+def remove_card(webui_id: int) -> None:
+    db.session.execute(db.delete(DashboardCard).where(DashboardCard.webui_id == webui_id))
+
+
+def set_card_health(rows: list[dict]) -> None:
+    # rows as written to webui_health, applied in the health checker's transaction
+    db.session.execute(_set_health, [
+        {
+            "card_id": row["webui_id"],
+            "health_up": row["up"],
+            "health_status_code": row["status_code"],
+            "health_latency_ms": row["latency_ms"],
+            "health_error": row["error"],
+            "health_last_up_at": row["last_up_at"],
+        }
+        for row in rows
+    ])
+
+
+def set_card_favicons(favicons: dict) -> None:
+    # webui id -> favicon url, applied in the favicon job's transaction
+    if favicons:
+        db.session.execute(_set_favicon, [
+            {"card_id": webui_id, "favicon_url": favicon_url} for webui_id, favicon_url in favicons.items()])
+
+
+def _refresh(stmt) -> None:
+    # rebuild cards for every webui matched by stmt, loading relations up front to avoid n+1
+    webuis = db.session.scalars(stmt.options(
+        joinedload(WebUI.host), selectinload(WebUI.categories))).unique().all()
+    if webuis:
+        refresh_cards(webuis)
+
+
+def refresh_host_cards(host_id: int) -> None:
+    # a host rename changes the group header and every card on it
+    _refresh(db.select(WebUI).where(WebUI.host_id == host_id))
+
+
+def refresh_category_cards(category_id: int) -> None:
+    _refresh(db.select(WebUI).where(WebUI.id.in_(
+        db.select(webui_categories.c.webui_id).where(
+            webui_categories.c.category_id == category_id)
+    )))
+
+
+def rebuild_cards(batch_size: int = 500) -> int:
+    # full rebuild in id-ordered batches so memory stays flat on big catalogues
+    db.session.execute(db.delete(DashboardCard).where(
+        DashboardCard.webui_id.not_in(db.select(WebUI.id))))
+
+    count = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(WebUI.id).where(WebUI.id > last_id)
+            .order_by(WebUI.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        _refresh(db.select(WebUI).where(WebUI.id.in_(ids)))
+        db.session.commit()
+        # drop the loaded objects so the identity map doesn't grow with the table
+        db.session.expunge_all()
+        count += len(ids)
+        last_id = ids[-1]
+
+    db.session.commit()
+    return count
+
+
+def ensure_cards() -> None:
+    # backfill after an upgrade - the card table starts empty on existing databases
+    cards = db.session.scalar(db.select(func.count()).select_from(DashboardCard))
+    total = db.session.scalar(db.select(func.count()).select_from(WebUI))
+    if cards != total:
+        rebuild_cards()
@@ -17,6 +17,8 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+from .dbpool import TimedQueuePool
+
 # resolve the project root and load .env from there
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
@@ -30,12 +32,107 @@ def _env_bool(name: str, default: bool) -> bool:
     return raw.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _engine_options(uri: str) -> dict:
+    # pool tuning only applies to real servers - sqlite picks its own pool class
+    if uri.startswith("sqlite"):
+        return {}
+
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # mariadb drops idle connections after wait_timeout, so recycle well before that
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        # test each connection on checkout so an overnight disconnect doesn't fail the first request
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+    if uri.startswith("mysql+pymysql"):
+        options["connect_args"] = {
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+            "read_timeout": int(os.getenv("DB_READ_TIMEOUT", "30")),
+            "write_timeout": int(os.getenv("DB_WRITE_TIMEOUT", "30")),
+        }
+    return options
+
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "change-me-in-production")
     APP_CREDENTIALS_KEY = os.getenv("APP_CREDENTIALS_KEY")  # optional separate key for credential encryption
+    # comma separated retired keys - still accepted for decryption until rotate-credentials-key has run
+    APP_CREDENTIALS_PREVIOUS_KEYS = tuple(
+        key.strip() for key in os.getenv("APP_CREDENTIALS_PREVIOUS_KEYS", "").split(",") if key.strip()
+    )
     AUTO_MIGRATE = _env_bool("AUTO_MIGRATE", True)
+    # seconds startup keeps retrying while the database isn't reachable yet, before giving up
+    MIGRATE_WAIT_TIMEOUT = float(os.getenv("MIGRATE_WAIT_TIMEOUT", "60"))
+    # seconds a logged-in user's record is cached per process, 0 looks it up on every request
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "30"))
+    # werkzeug hash method for new and upgraded passwords - older hashes are rewritten on the next login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # passwords hashed at once per process, and seconds a login waits for a free slot before getting a 503
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "5"))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # prometheus /metrics endpoint - set METRICS_TOKEN to require "Authorization: Bearer <token>",
+    # without one it only answers requests from loopback
+    METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # seconds between each worker writing its values to METRICS_DIR
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+    # per-request sql counting - off by default, adds X-DB-Queries/Server-Timing headers and a slow request log
+    DB_QUERY_STATS = _env_bool("DB_QUERY_STATS", False)
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    # the same statement this many times in one request gets flagged as a likely n+1
+    N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+    # favicon discovery - per http call timeout and an overall budget for the whole resolution (seconds)
+    FAVICON_TIMEOUT = float(os.getenv("FAVICON_TIMEOUT", "4"))
+    FAVICON_DEADLINE = float(os.getenv("FAVICON_DEADLINE", "8"))
+    # icons are downloaded once and served from here - mount it as a volume in docker
+    DATA_DIR = os.getenv("DATA_DIR", str(BASE_DIR / "data"))
+    FAVICON_DIR = os.getenv("FAVICON_DIR", os.path.join(DATA_DIR, "favicons"))
+    # workers write their metrics here and a scrape adds them up - empty reports each worker on its own
+    METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(DATA_DIR, "metrics"))
+    FAVICON_MAX_BYTES = int(os.getenv("FAVICON_MAX_BYTES", str(512 * 1024)))
+    # rendered dashboard cache - entries are keyed on the filters and dropped on every write
+    RENDER_CACHE_ENTRIES = int(os.getenv("RENDER_CACHE_ENTRIES", "64"))
+    RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    # output of flask build-assets - fingerprinted, pre-compressed css/js/fonts served from /assets/
+    ASSETS_DIR = os.getenv("ASSETS_DIR", str(BASE_DIR / "dist"))
+    # background favicon jobs - worker threads per process and how many jobs may wait behind them
+    FAVICON_WORKERS = int(os.getenv("FAVICON_WORKERS", "4"))
+    FAVICON_QUEUE_SIZE = int(os.getenv("FAVICON_QUEUE_SIZE", "200"))
+    # hits are cached per page, failures per origin - hits are reused for the ttl, failures are retried after a backoff
+    # that starts at FAVICON_RETRY_MIN and doubles up to FAVICON_RETRY_MAX (seconds, 0 ttl turns caching off)
+    FAVICON_CACHE_TTL = float(os.getenv("FAVICON_CACHE_TTL", str(7 * 24 * 3600)))
+    FAVICON_RETRY_MIN = float(os.getenv("FAVICON_RETRY_MIN", "300"))
+    FAVICON_RETRY_MAX = float(os.getenv("FAVICON_RETRY_MAX", str(24 * 3600)))
+
+    # background reachability checks - every webui is probed once per interval (+/- jitter, as a fraction)
+    # off unless asked for, since it sends requests to every saved url
+    HEALTH_CHECKS_ENABLED = _env_bool("HEALTH_CHECKS_ENABLED", False)
+    HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "60"))
+    HEALTH_JITTER = float(os.getenv("HEALTH_JITTER", "0.2"))
+    # connect and read timeout per probe, probes running at once, and at most this many against one host
+    HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "2"))
+    HEALTH_CONCURRENCY = int(os.getenv("HEALTH_CONCURRENCY", "64"))
+    HEALTH_PER_HOST = int(os.getenv("HEALTH_PER_HOST", "8"))
+
+    # production server (flask serve / the docker image) - 0 workers means size from the cpu count
+    WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:5000")
+    WEB_WORKERS = int(os.getenv("WEB_WORKERS", "0"))
+    WEB_THREADS = int(os.getenv("WEB_THREADS", "4"))
+    WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", "60"))
+    WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+    WEB_KEEPALIVE = int(os.getenv("WEB_KEEPALIVE", "5"))
+    # a worker is replaced after this many requests (plus up to the jitter), 0 turns recycling off
+    WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", "1000"))
+    WEB_MAX_REQUESTS_JITTER = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "100"))
+    WEB_ACCESS_LOG = _env_bool("WEB_ACCESS_LOG", True)
+
     # db conn vars
     _db_user = os.getenv("DB_USER", "root")
     _db_password = os.getenv("DB_PASSWORD", "password")
@@ -48,3 +145,4 @@ class Config:
         "DATABASE_URL",
         f"mysql+pymysql://{_db_user}:{_db_password}@{_db_host}:{_db_port}/{_db_name}?charset=utf8mb4",
     )
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
@@ -0,0 +1,63 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from cryptography.fernet import InvalidToken, MultiFernet
+
+from .models import WebUI, db
+from .utils import credential_key_sources, derive_fernet
+
+
+def rotate_credentials(old_keys: tuple[str, ...] = (), batch_size: int = 500) -> dict:
+    # re-encrypt every stored password with the current key
+    # rows are streamed in id order and committed per batch, so memory and lock time stay bounded
+    sources = credential_key_sources()
+    current = derive_fernet(sources[0])
+    rotator = MultiFernet([current, *(derive_fernet(key)
+                          for key in (*sources[1:], *old_keys))])
+
+    summary = {"rotated": 0, "unchanged": 0, "failed": []}
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(WebUI.id, WebUI.credential_password_encrypted)
+            .where(WebUI.id > last_id, WebUI.credential_password_encrypted.is_not(None))
+            .order_by(WebUI.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            token = row.credential_password_encrypted.encode("utf-8")
+            try:
+                # already on the current key - leave it, so re-running after an interruption is cheap
+                current.decrypt(token)
+                summary["unchanged"] += 1
+                continue
+            except InvalidToken:
+                pass
+            try:
+                updates.append({"id": row.id, "credential_password_encrypted": rotator.rotate(token).decode("utf-8")})
+            except InvalidToken:
+                # none of the keys we were given can read it - left untouched
+                summary["failed"].append(row.id)
+
+        if updates:
+            db.session.execute(db.update(WebUI), updates)
+        db.session.commit()
+        summary["rotated"] += len(updates)
+        last_id = rows[-1].id
+
+    return summary
@@ -0,0 +1,117 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from threading import Lock
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    # process-wide counters fed by pool events - cheap enough to leave on all the time
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        # a forked worker starts from zero, the parent's numbers are not its own
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        # checkouts that had to block because every connection was in use
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        # time spent opening new connections, kept apart from waiting
+        self.connect_seconds = 0.0
+        self.max_connect_seconds = 0.0
+
+    def _incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_connect(self, seconds: float) -> None:
+        with self._lock:
+            self.connect_seconds += seconds
+            self.max_connect_seconds = max(self.max_connect_seconds, seconds)
+
+    def attach(self, engine: Engine) -> None:
+        event.listen(engine, "connect", lambda *args: self._incr("connects"))
+        event.listen(engine, "checkout", lambda *args: self._incr("checkouts"))
+        # hard invalidations are dead connections (pre-ping failures, server gone away, recycle)
+        event.listen(engine, "invalidate", lambda *args: self._incr("invalidations"))
+
+    def snapshot(self, engine: Engine) -> dict:
+        pool = engine.pool
+        stats = {
+            "pool_class": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "waits": self.waits,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+            "wait_seconds_max": round(self.max_wait_seconds, 6),
+            "connect_seconds_total": round(self.connect_seconds, 6),
+            "connect_seconds_max": round(self.max_connect_seconds, 6),
+        }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long checkouts blocked because the pool was exhausted, and separately
+    # how long opening connections takes - a checkout served from the idle queue or by opening an overflow
+    # connection never counts as a wait
+
+    def _do_get(self):
+        # the same test QueuePool uses to decide whether to block on the queue
+        exhausted = -1 < self._max_overflow <= self._overflow and self._pool.empty()
+        if not exhausted:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+    def _should_wrap_creator(self, creator):
+        # every connection the pool opens goes through this, reconnects after invalidation included
+        invoke = super()._should_wrap_creator(creator)
+
+        def timed_creator(record):
+            started = time.perf_counter()
+            try:
+                return invoke(record)
+            finally:
+                pool_stats.record_connect(time.perf_counter() - started)
+
+        return timed_creator
@@ -0,0 +1,240 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Optional
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+
+from .favicons import favicon_dir, is_local, store_favicon
+from .metrics import FAVICON_CACHE
+from .models import FaviconOrigin, db
+from .utils import normalize_url, probe_favicon, resolve_favicon
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# page key -> [lock, users] - one resolution per page at a time in this process, the rest wait for its result
+_inflight = {}
+_inflight_lock = Lock()
+
+
+def _utcnow() -> datetime:
+    # timestamps are stored as naive utc
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def origin_key(site_url: str) -> Optional[str]:
+    # scheme://host[:port], lowercased and without the default port - None for urls we can't resolve anyway
+    parsed = urlparse(normalize_url(site_url))
+    try:
+        port = parsed.port
+    except ValueError:
+        return None
+    if not parsed.hostname or parsed.scheme not in _DEFAULT_PORTS:
+        return None
+
+    host = f"[{parsed.hostname}]" if ":" in parsed.hostname else parsed.hostname
+    if port is not None and port != _DEFAULT_PORTS[parsed.scheme]:
+        host = f"{host}:{port}"
+    return f"{parsed.scheme}://{host}"[:255]
+
+
+def page_key(site_url: str) -> Optional[str]:
+    # origin plus path, always ending in a slash so it never collides with a bare origin key
+    # path-routed services behind one proxy declare different icons, so hits are cached per page
+    origin = origin_key(site_url)
+    if origin is None:
+        return None
+    key = f"{origin}{urlparse(normalize_url(site_url)).path.rstrip('/')}/"
+    if len(key) > 255:
+        # too long for the column - keep a readable prefix and make it unique with a digest
+        key = f"{key[:190]}#{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+    return key
+
+
+def _is_origin_fallback(icon_url: str, origin: str) -> bool:
+    # the /favicon.ico at the root of the origin - the one icon every page on it can share
+    return origin_key(icon_url) == origin and urlparse(icon_url).path == "/favicon.ico"
+
+
+@contextmanager
+def _single_flight(key: str):
+    with _inflight_lock:
+        entry = _inflight.setdefault(key, [Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _inflight[key]
+
+
+def _store(resolved: Optional[str]) -> Optional[str]:
+    # keep our own copy so browsers never have to reach the origin for it
+    if resolved:
+        return store_favicon(resolved) or resolved
+    return resolved
+
+
+def _entry(key: str, not_before: Optional[datetime]):
+    # the cached row for a page or origin key, or None if there is nothing usable
+    row = db.session.execute(
+        db.select(FaviconOrigin.icon_url, FaviconOrigin.checked_at, FaviconOrigin.expires_at)
+        .where(FaviconOrigin.origin == key)
+    ).first()
+    if row is None or row.expires_at <= _utcnow() or (not_before is not None and row.checked_at < not_before):
+        return None
+    # the stored copy was removed (wiped data dir) - resolve again rather than hand out a 404
+    if row.icon_url and is_local(row.icon_url) and not (favicon_dir() / row.icon_url.rsplit("/", 1)[-1]).exists():
+        return None
+    return row
+
+
+def _record(key: str, icon_url: Optional[str], retry: bool = True) -> None:
+    config = current_app.config
+    now = _utcnow()
+    row = db.session.get(FaviconOrigin, key)
+    if row is None:
+        row = FaviconOrigin(origin=key, failures=0)
+        db.session.add(row)
+
+    if icon_url:
+        row.icon_url = icon_url
+        row.failures = 0
+        wait = config["FAVICON_CACHE_TTL"]
+    else:
+        row.icon_url = None
+        row.failures = (row.failures or 0) + 1
+        # exponent capped so a long dead origin can't overflow the arithmetic
+        wait = min(config["FAVICON_RETRY_MAX"], config["FAVICON_RETRY_MIN"] * 2 ** min(row.failures - 1, 30))
+    row.checked_at = now
+    row.expires_at = now + timedelta(seconds=wait)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another process recorded the same key first - update its row instead
+        db.session.rollback()
+        if not retry:
+            raise
+        _record(key, icon_url, retry=False)
+
+
+def _reset_backoff(origin: str) -> None:
+    # the origin answered - drop its failure streak, if it had one
+    db.session.execute(
+        db.delete(FaviconOrigin).where(FaviconOrigin.origin == origin, FaviconOrigin.icon_url.is_(None))
+    )
+    db.session.commit()
+
+
+def resolve_icon(site_url: str, not_before: Optional[datetime] = None) -> Optional[str]:
+    # resolve and store a favicon, going through the favicon cache - returns the favicon_url to save
+    # hits and "no icon on this page" are cached per page - the /favicon.ico fallback and the backoff for
+    # an origin that can't be reached at all are shared by every page on the origin
+    # entries checked before not_before are ignored (refresh-favicons --ignore-cache)
+    # commits its own short transactions, so call it with nothing pending in the session
+    origin = origin_key(site_url)
+    if origin is None or current_app.config["FAVICON_CACHE_TTL"] <= 0:
+        return _store(resolve_favicon(
+            site_url,
+            timeout=current_app.config["FAVICON_TIMEOUT"],
+            deadline=current_app.config["FAVICON_DEADLINE"],
+        ))
+
+    page = page_key(site_url)
+    with _single_flight(page):
+        hit = _entry(page, not_before)
+        if hit is not None:
+            FAVICON_CACHE.inc("hit" if hit.icon_url else "negative")
+            return hit.icon_url
+
+        shared = _entry(origin, not_before)
+        if shared is not None and shared.icon_url is None:
+            FAVICON_CACHE.inc("negative")
+            return None
+        FAVICON_CACHE.inc("miss")
+        fallback_icon = shared.icon_url if shared is not None else None
+
+        # release the connection while we're out on the network
+        db.session.rollback()
+        resolved, unreachable = probe_favicon(
+            site_url,
+            timeout=current_app.config["FAVICON_TIMEOUT"],
+            deadline=current_app.config["FAVICON_DEADLINE"],
+            fallback_ok=fallback_icon is not None,
+        )
+        if unreachable:
+            # nothing on this origin will answer either, so every page on it waits out the backoff
+            _record(origin, None)
+            return None
+
+        # the origin answered, so its failure streak (if any) is over
+        _reset_backoff(origin)
+        if not resolved:
+            # only this page - its neighbours behind the same proxy may well declare their own icons
+            _record(page, None)
+            return None
+
+        if _is_origin_fallback(resolved, origin):
+            # reuse the stored copy other pages on this origin already fetched
+            icon_url = fallback_icon or _store(resolved)
+            _record(origin, icon_url)
+        else:
+            icon_url = _store(resolved)
+        _record(page, icon_url)
+        return icon_url
+
+
+def cache_stats(failing_limit: int = 10) -> dict:
+    now = _utcnow()
+    current = FaviconOrigin.expires_at > now
+    total, good, backing_off = db.session.execute(db.select(
+        func.count(),
+        func.coalesce(func.sum(case((current & FaviconOrigin.icon_url.is_not(None), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((current & FaviconOrigin.icon_url.is_(None), 1), else_=0)), 0),
+    ).select_from(FaviconOrigin)).one()
+    failing = db.session.execute(
+        db.select(FaviconOrigin.origin, FaviconOrigin.failures, FaviconOrigin.expires_at)
+        .where(FaviconOrigin.icon_url.is_(None), current)
+        .order_by(FaviconOrigin.failures.desc(), FaviconOrigin.origin)
+        .limit(failing_limit)
+    ).all()
+    return {
+        "total": total,
+        "good": good,
+        "backing_off": backing_off,
+        "expired": total - good - backing_off,
+        "failing": [(row.origin, row.failures, row.expires_at) for row in failing],
+    }
+
+
+def clear_cache(failing_only: bool = False) -> int:
+    # forget cached results so the next save or refresh resolves from scratch
+    stmt = db.delete(FaviconOrigin)
+    if failing_only:
+        stmt = stmt.where(FaviconOrigin.icon_url.is_(None))
+    count = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return count
@@ -0,0 +1,102 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from flask import current_app, url_for
+
+from .utils import fetch_image
+
+
+# stored favicon_url values that start with this point at our own copy instead of the origin
+LOCAL_PREFIX = "/favicons/"
+
+# filenames are <sha256>.<ext> - anything else is rejected before touching the filesystem
+FILENAME_RE = re.compile(r"^[0-9a-f]{64}\.(png|ico|jpg|gif|webp|svg|bmp)$")
+
+
+def _sniff_extension(data: bytes) -> Optional[str]:
+    # work out the image type from the bytes - servers love sending html error pages with a 200
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\x00\x00\x01\x00"):
+        return "ico"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "webp"
+    if data.startswith(b"BM"):
+        return "bmp"
+    head = data[:1024].lstrip().lower()
+    if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return "svg"
+    return None
+
+
+def favicon_dir() -> Path:
+    return Path(current_app.config["FAVICON_DIR"])
+
+
+def store_favicon(icon_url: str) -> Optional[str]:
+    # download an icon once and keep it under its content hash
+    # returns the local favicon_url reference, or None if the download or type check failed
+    data = fetch_image(
+        icon_url,
+        timeout=current_app.config["FAVICON_TIMEOUT"],
+        max_bytes=current_app.config["FAVICON_MAX_BYTES"],
+    )
+    if not data:
+        return None
+
+    extension = _sniff_extension(data)
+    if extension is None:
+        return None
+
+    filename = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    directory = favicon_dir()
+    target = directory / filename
+    if not target.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        # write to a temp file and rename so readers never see a half-written icon
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, target)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    return f"{LOCAL_PREFIX}{filename}"
+
+
+def is_local(favicon_url: Optional[str]) -> bool:
+    return bool(favicon_url) and favicon_url.startswith(LOCAL_PREFIX)
+
+
+def favicon_src(favicon_url: Optional[str]) -> str:
+    # turn a stored favicon_url into something an <img> can use - local copies go through url_for
+    if not favicon_url:
+        return ""
+    if is_local(favicon_url):
+        return url_for("main.favicon_file", filename=favicon_url[len(LOCAL_PREFIX):])
+    return favicon_url
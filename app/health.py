@@ -0,0 +1,254 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from threading import BoundedSemaphore, Event, Lock, Thread
+from urllib.parse import urlparse
+
+import requests
+import urllib3
+from flask import Flask
+from requests.adapters import HTTPAdapter
+from sqlalchemy import func, text
+
+from .cache import bump_generation
+from .cards import set_card_health
+from .metrics import HEALTH_SWEEPS
+from .models import WebUI, WebUIHealth, db
+from .utils import interleave_by_host, normalize_url
+
+
+# any http answer below this counts as up - a 502/503 from a reverse proxy means the app behind it isn't
+DOWN_STATUS = 500
+
+# separate from the favicon session so a sweep never competes with favicon jobs for pooled connections
+_http = requests.Session()
+_http.verify = False
+_http.headers["User-Agent"] = "webui-manager-health/1.0"
+# no retries - a retry would only hide a slow or flapping service
+_http_adapter = HTTPAdapter(pool_connections=128, pool_maxsize=8, max_retries=0)
+_http.mount("http://", _http_adapter)
+_http.mount("https://", _http_adapter)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def _utcnow() -> datetime:
+    # timestamps are stored as naive utc
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def probe(url: str, timeout: float) -> dict:
+    # one request, headers only - the body is never read, so big pages cost the same as small ones
+    started = time.perf_counter()
+    try:
+        response = _http.get(url, timeout=(timeout, timeout), stream=True, allow_redirects=False)
+    except requests.RequestException as exc:
+        return {
+            "up": False,
+            "status_code": None,
+            "latency_ms": None,
+            "error": type(exc).__name__[:120],
+        }
+    latency = int((time.perf_counter() - started) * 1000)
+    response.close()
+    return {
+        "up": response.status_code < DOWN_STATUS,
+        "status_code": response.status_code,
+        "latency_ms": latency,
+        "error": None,
+    }
+
+
+def check_all(app: Flask) -> dict:
+    # probe every webui once and store the results - returns a summary for the cli and the logs
+    started = time.monotonic()
+    timeout = app.config["HEALTH_TIMEOUT"]
+    concurrency = max(1, app.config["HEALTH_CONCURRENCY"])
+    per_host = max(1, app.config["HEALTH_PER_HOST"])
+
+    with app.app_context():
+        rows = db.session.execute(db.select(WebUI.id, WebUI.url).order_by(WebUI.id)).all()
+        db.session.rollback()
+
+    host_slots = defaultdict(lambda: BoundedSemaphore(per_host))
+    host_slots_lock = Lock()
+
+    def work(row):
+        url = normalize_url(row.url)
+        with host_slots_lock:
+            slot = host_slots[urlparse(url).hostname or ""]
+        with slot:
+            return row.id, probe(url, timeout)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="health-probe") as pool:
+        results = dict(pool.map(work, interleave_by_host(rows)))
+
+    with app.app_context():
+        changed = _store(results)
+
+    elapsed = time.monotonic() - started
+    HEALTH_SWEEPS.observe(elapsed)
+    up = sum(1 for result in results.values() if result["up"])
+    return {
+        "total": len(results),
+        "up": up,
+        "down": len(results) - up,
+        "changed": changed,
+        "elapsed": elapsed,
+    }
+
+
+def _badge(row) -> tuple:
+    # what the cached cards show: the colour plus the status or error in the tooltip
+    # latency and check times are left out of the cards so they don't need a bump every sweep
+    if isinstance(row, dict):
+        return row["up"], row["status_code"], None if row["up"] else row["error"]
+    return row.up, row.status_code, None if row.up else row.error
+
+
+def _store(results: dict) -> int:
+    # one bulk insert + one bulk update per sweep, returns how many badges changed
+    now = _utcnow()
+    existing = {
+        row.webui_id: row
+        for row in db.session.execute(
+            db.select(WebUIHealth.webui_id, WebUIHealth.up, WebUIHealth.status_code,
+                      WebUIHealth.error, WebUIHealth.last_up_at))
+    }
+    # webuis deleted while we were probing
+    alive = set(db.session.scalars(db.select(WebUI.id)))
+
+    inserts, updates = [], []
+    changed = 0
+    for webui_id, result in results.items():
+        if webui_id not in alive:
+            continue
+        previous = existing.get(webui_id)
+        values = {
+            "webui_id": webui_id,
+            **result,
+            "checked_at": now,
+            "last_up_at": now if result["up"] else (previous.last_up_at if previous else None),
+        }
+        if previous is None:
+            inserts.append(values)
+            changed += 1
+        else:
+            updates.append(values)
+            changed += _badge(previous) != _badge(result)
+
+    if inserts:
+        db.session.execute(db.insert(WebUIHealth), inserts)
+    if updates:
+        db.session.execute(db.update(WebUIHealth), updates)
+    # the dashboard reads health off its own rows, kept in step in the same transaction
+    if inserts or updates:
+        set_card_health(inserts + updates)
+    # sqlite doesn't enforce the cascade, so tidy up rows for webuis that are gone
+    db.session.execute(db.delete(WebUIHealth).where(WebUIHealth.webui_id.not_in(db.select(WebUI.id))))
+    db.session.commit()
+
+    # the dashboard is cached per generation - only invalidate when a badge or its tooltip changes
+    if changed:
+        bump_generation()
+    return changed
+
+
+def forget_health(webui_id: int) -> None:
+    # called when a webui is deleted, in the caller's transaction
+    db.session.execute(db.delete(WebUIHealth).where(WebUIHealth.webui_id == webui_id))
+
+
+@contextmanager
+def _sweep_lock():
+    # mysql/mariadb advisory lock so only one worker sweeps at a time, yields False if another one is
+    # other backends (sqlite in dev) run single process, so they go without
+    if db.engine.dialect.name != "mysql":
+        yield True
+        return
+
+    with db.engine.connect() as conn:
+        acquired = conn.scalar(text("SELECT GET_LOCK(CONCAT(DATABASE(), '.health_sweep'), 0)")) == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT RELEASE_LOCK(CONCAT(DATABASE(), '.health_sweep'))"))
+
+
+class HealthChecker:
+    # background thread that sweeps every webui on a jittered interval
+    # every worker process runs one, but the lock and the freshness check mean only one of them sweeps per interval
+
+    def __init__(self):
+        self.app = None
+        self._pid = None
+        self._lock = Lock()
+        self._stop = Event()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        app.extensions["health_checker"] = self
+        if app.config["HEALTH_CHECKS_ENABLED"]:
+            # started from the first request rather than here - threads don't survive gunicorn's fork,
+            # and cli commands should never start probing
+            app.before_request(self.ensure_running)
+
+    def ensure_running(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            Thread(target=self._loop, name="health-checker", daemon=True).start()
+
+    def _next_delay(self) -> float:
+        interval = self.app.config["HEALTH_INTERVAL"]
+        jitter = self.app.config["HEALTH_JITTER"]
+        return interval * random.uniform(1 - jitter, 1 + jitter)
+
+    def _loop(self) -> None:
+        # small random delay first so workers booting together don't all try at once
+        delay = random.uniform(1, 5)
+        while not self._stop.wait(delay):
+            try:
+                self._maybe_sweep()
+            except Exception:
+                self.app.logger.exception("health sweep failed")
+            delay = self._next_delay()
+
+    def _maybe_sweep(self) -> None:
+        with self.app.app_context(), _sweep_lock() as acquired:
+            if not acquired:
+                return
+            # another worker swept recently - skip this round
+            latest = db.session.scalar(db.select(func.max(WebUIHealth.checked_at)))
+            db.session.rollback()
+            fresh_for = timedelta(seconds=self.app.config["HEALTH_INTERVAL"] / 2)
+            if latest is not None and _utcnow() - latest < fresh_for:
+                return
+            summary = check_all(self.app)
+        self.app.logger.info(
+            "health sweep: %s up, %s down, %s changed in %.1fs",
+            summary["up"], summary["down"], summary["changed"], summary["elapsed"])
+
+
+health_checker = HealthChecker()
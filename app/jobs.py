@@ -0,0 +1,229 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from threading import BoundedSemaphore, Lock
+from urllib.parse import urlparse
+
+from flask import Flask
+
+from .cache import bump_generation
+from .cards import set_card_favicons
+from .favicon_cache import resolve_icon
+from .favicons import favicon_dir, is_local
+from .models import WebUI, db
+from .utils import interleave_by_host, normalize_url
+
+
+# job states reported by the status endpoint - "idle" means this process knows nothing about the id
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+IDLE = "idle"
+
+# seconds a finished job's state is remembered - long enough for the dashboard poll to pick it up
+FINISHED_TTL = 300
+
+
+class FaviconJobs:
+    # in-process work queue that resolves favicons off the request path
+    # jobs are keyed by webui id so a burst of edits to one row only queues it once
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._slots = None
+        self._lock = Lock()
+        self._states = {}
+        # finished ids in the order they finished -> when, so old results can be dropped
+        self._finished = OrderedDict()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        workers = app.config["FAVICON_WORKERS"]
+        # executor threads are only spawned on first submit, so creating it here is cheap
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="favicon-job")
+        # running + queued jobs are capped so a flood of saves can't grow the backlog without bound
+        self._slots = BoundedSemaphore(workers + app.config["FAVICON_QUEUE_SIZE"])
+        app.extensions["favicon_jobs"] = self
+
+    def submit(self, webui_id: int) -> bool:
+        # returns False if the queue is full - the row keeps its old icon and can be retried later
+        with self._lock:
+            if self._states.get(webui_id) == PENDING:
+                return True
+            if not self._slots.acquire(blocking=False):
+                self.app.logger.warning(
+                    "favicon queue full, skipping webui %s", webui_id)
+                return False
+            self._states[webui_id] = PENDING
+            self._finished.pop(webui_id, None)
+
+        self._executor.submit(self._run, webui_id)
+        return True
+
+    def status(self, webui_id: int) -> str:
+        with self._lock:
+            self._prune()
+            return self._states.get(webui_id, IDLE)
+
+    def _set_state(self, webui_id: int, state: str) -> None:
+        with self._lock:
+            self._states[webui_id] = state
+            if state in (DONE, FAILED):
+                self._finished[webui_id] = time.monotonic()
+                self._finished.move_to_end(webui_id)
+            self._prune()
+
+    def _prune(self) -> None:
+        # finished jobs are forgotten after a while, so the state map doesn't keep every id ever saved
+        cutoff = time.monotonic() - FINISHED_TTL
+        while self._finished:
+            webui_id, finished_at = next(iter(self._finished.items()))
+            if finished_at > cutoff:
+                break
+            del self._finished[webui_id]
+            del self._states[webui_id]
+
+    def _run(self, webui_id: int) -> None:
+        try:
+            with self.app.app_context():
+                # a newer save may have re-queued this id while we were waiting - it'll see the latest url anyway
+                self._set_state(webui_id, RUNNING)
+                webui = db.session.get(WebUI, webui_id)
+                if webui is None:
+                    # deleted before we got to it
+                    self._set_state(webui_id, DONE)
+                    return
+
+                url = webui.url
+                # release the connection while we're out on the network
+                db.session.rollback()
+
+                # reuses the last result for this origin when there is one, otherwise goes out to the network
+                resolved = resolve_icon(url)
+
+                webui = db.session.get(WebUI, webui_id)
+                # only write back if the row still points at the url we resolved for
+                if resolved and webui is not None and webui.url == url:
+                    webui.favicon_url = resolved
+                    set_card_favicons({webui_id: resolved})
+                    db.session.commit()
+                    bump_generation()
+                self._set_state(webui_id, DONE if resolved else FAILED)
+        except Exception:
+            self.app.logger.exception(
+                "favicon job failed for webui %s", webui_id)
+            self._set_state(webui_id, FAILED)
+        finally:
+            self._slots.release()
+
+
+favicon_jobs = FaviconJobs()
+
+
+def _needs_refresh(favicon_url: str | None) -> bool:
+    # missing, still pointing at the origin, or the local file went away
+    if not is_local(favicon_url):
+        return True
+    return not (favicon_dir() / favicon_url.rsplit("/", 1)[-1]).exists()
+
+
+def refresh_favicons(app: Flask, refresh_all: bool = False, concurrency: int = 8,
+                     per_host: int = 2, batch_size: int = 50, ignore_cache: bool = False) -> dict:
+    # bulk re-resolve favicons - used by the refresh-favicons cli command
+    # returns a summary with counts, timing and the rows that failed
+    started = time.monotonic()
+    # ignore_cache skips results cached before this run (naive utc, like the stored timestamps)
+    # webuis sharing a page still resolve it only once
+    not_before = datetime.now(timezone.utc).replace(tzinfo=None) if ignore_cache else None
+
+    with app.app_context():
+        # only pull the columns we need, not full orm objects
+        rows = db.session.execute(
+            db.select(WebUI.id, WebUI.url, WebUI.favicon_url).order_by(WebUI.id)
+        ).all()
+        if not refresh_all:
+            rows = [row for row in rows if _needs_refresh(row.favicon_url)]
+        db.session.rollback()
+
+    host_slots = defaultdict(lambda: BoundedSemaphore(max(1, per_host)))
+    host_slots_lock = Lock()
+
+    def work(row):
+        # (row, favicon_url, error) - failures are caught here so they keep the row they belong to
+        host = urlparse(normalize_url(row.url)).hostname or ""
+        with host_slots_lock:
+            slot = host_slots[host]
+        try:
+            with slot, app.app_context():
+                return row, resolve_icon(row.url, not_before=not_before), None
+        except Exception as exc:
+            app.logger.exception("favicon refresh failed for webui %s", row.id)
+            return row, None, str(exc)
+
+    resolved_count = 0
+    failures = []
+    pending_updates = []
+
+    def flush():
+        # one short transaction per batch so we never hold locks for the whole run
+        if not pending_updates:
+            return
+        with app.app_context():
+            applied = {}
+            for row, favicon_url in pending_updates:
+                # skip rows whose url was edited while we were resolving
+                result = db.session.execute(
+                    db.update(WebUI)
+                    .where(WebUI.id == row.id, WebUI.url == row.url)
+                    .values(favicon_url=favicon_url)
+                )
+                if result.rowcount:
+                    applied[row.id] = favicon_url
+            set_card_favicons(applied)
+            db.session.commit()
+            bump_generation()
+        pending_updates.clear()
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency),
+                            thread_name_prefix="favicon-refresh") as pool:
+        futures = [pool.submit(work, row) for row in interleave_by_host(rows)]
+        for future in as_completed(futures):
+            row, resolved, error = future.result()
+            if error is not None:
+                failures.append((row.id, row.url, error))
+            elif resolved:
+                resolved_count += 1
+                pending_updates.append((row, resolved))
+                if len(pending_updates) >= batch_size:
+                    flush()
+            else:
+                failures.append((row.id, row.url, "no icon found"))
+        flush()
+
+    elapsed = time.monotonic() - started
+    return {
+        "total": len(rows),
+        "resolved": resolved_count,
+        "failed": len(failures),
+        "failures": failures,
+        "elapsed": elapsed,
+        "rate": len(rows) / elapsed if elapsed else 0.0,
+    }
@@ -0,0 +1,422 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import hmac
+import ipaddress
+import json
+import os
+import secrets
+import socket
+import time
+from bisect import bisect_left
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+try:
+    import fcntl
+except ImportError:  # windows - only the dev server runs there, and that's a single process
+    fcntl = None
+
+from flask import Flask, Response, abort, g, request
+from sqlalchemy import event
+
+from .dbpool import pool_stats
+from .models import db
+
+
+# latency buckets in seconds - covers cached dashboard hits up to slow favicon probes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merge(self, totals: dict, snapshot: list) -> None:
+        for key, value in snapshot:
+            key = tuple(key)
+            totals[key] = totals.get(key, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self, totals: dict | None = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        if totals is None:
+            totals = {}
+            self.merge(totals, self.snapshot())
+        for label_values, value in totals.items():
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+inf last), sum, count]
+        self._values = {}
+        self._lock = Lock()
+
+    def observe(self, seconds: float, *label_values) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += seconds
+            entry[2] += 1
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(key), list(value[0]), value[1], value[2]] for key, value in self._values.items()]
+
+    def merge(self, totals: dict, snapshot: list) -> None:
+        for key, counts, total, count in snapshot:
+            entry = totals.setdefault(tuple(key), [[0] * (len(self.buckets) + 1), 0.0, 0])
+            # a snapshot written before the buckets changed can't be lined up, so it's left out
+            if len(counts) != len(entry[0]):
+                continue
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+            entry[2] += count
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self, totals: dict | None = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        if totals is None:
+            totals = {}
+            self.merge(totals, self.snapshot())
+        for label_values, (counts, total, count) in totals.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                bucket_labels = _labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+REQUESTS = Counter(
+    "webui_http_requests_total", "HTTP requests by endpoint, method and status.",
+    ("endpoint", "method", "status"))
+REQUEST_LATENCY = Histogram(
+    "webui_http_request_duration_seconds", "HTTP request latency by endpoint and method.",
+    ("endpoint", "method"))
+DB_QUERIES = Histogram(
+    "webui_db_query_duration_seconds", "Database statement execution time.")
+FAVICON_RESOLUTIONS = Histogram(
+    "webui_favicon_resolution_duration_seconds", "Favicon resolution time by outcome.",
+    ("outcome",), buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0))
+FAVICON_CACHE = Counter(
+    "webui_favicon_cache_lookups_total",
+    "Favicon resolution cache lookups by result (hit, negative, miss).", ("result",))
+PASSWORD_HASHES = Histogram(
+    "webui_password_hash_duration_seconds", "Password hashing time by operation (hash, verify).",
+    ("operation",), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+PASSWORD_HASH_REJECTED = Counter(
+    "webui_password_hash_rejected_total", "Password hashes refused because no slot freed up in time.",
+    ("operation",))
+HEALTH_SWEEPS = Histogram(
+    "webui_health_sweep_duration_seconds", "Time taken to probe every WebUI once.",
+    buckets=(1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+
+_METRICS = (REQUESTS, REQUEST_LATENCY, DB_QUERIES, FAVICON_RESOLUTIONS, FAVICON_CACHE, PASSWORD_HASHES,
+            PASSWORD_HASH_REJECTED, HEALTH_SWEEPS)
+
+
+# pool values reported at scrape time - counters add up over every process that ever ran,
+# gauges only over the ones still running
+_POOL_COUNTERS = ("connects", "checkouts", "invalidations", "waits", "wait_seconds_total", "connect_seconds_total")
+_POOL_GAUGES = ("checked_out", "checked_in", "overflow")
+
+
+def _pool_values() -> dict:
+    stats = pool_stats.snapshot(db.engine)
+    return {key: stats[key] for key in _POOL_COUNTERS + _POOL_GAUGES if key in stats}
+
+
+def _render_pool(values: dict) -> list[str]:
+    lines = []
+    for key in _POOL_GAUGES + _POOL_COUNTERS:
+        if key in values:
+            name = f"webui_db_pool_{key}"
+            kind = "gauge" if key in _POOL_GAUGES else "counter"
+            lines += [f"# TYPE {name} {kind}", f"{name} {values[key]}"]
+    return lines
+
+
+def _add(totals: dict, values: dict, keys: tuple) -> None:
+    for key in keys:
+        if key in values:
+            totals[key] = totals.get(key, 0) + values[key]
+
+
+class SharedMetrics:
+    # every worker writes its values to a file in a shared directory every few seconds, and a scrape sums
+    # them all - so whichever worker answers /metrics reports the same totals, and a recycled worker's
+    # counts are kept instead of dropping back to zero (the prometheus_client multiprocess approach)
+    # files of workers that exited, or stopped writing, are folded into one archive file
+
+    ARCHIVE = "archive.json"
+
+    def __init__(self):
+        self.app = None
+        self.directory = None
+        self.interval = 5.0
+        self._pid = None
+        self._path = None
+        # the file this process last wrote, to notice it being archived under it
+        self._written = None
+        self._lock = Lock()
+        self._stop = Event()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        self.directory = Path(app.config["METRICS_DIR"]) if app.config["METRICS_DIR"] else None
+        self.interval = app.config["METRICS_FLUSH_INTERVAL"]
+        app.extensions["shared_metrics"] = self
+
+    @property
+    def stale_after(self) -> float:
+        # well past gunicorn's worker timeout, so a file this old belongs to a dead worker
+        return max(120.0, self.interval * 10)
+
+    def after_fork(self) -> None:
+        # the parent's values aren't this worker's - start from zero under a file of its own
+        for metric in _METRICS:
+            metric.reset()
+        pool_stats.reset()
+        self._pid = None
+        self._path = None
+        self._written = None
+
+    def ensure_running(self) -> None:
+        # started from the first request - threads don't survive gunicorn's fork
+        if self.directory is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._path = self.directory / f"{socket.gethostname()}-{self._pid}-{secrets.token_hex(4)}.json"
+            Thread(target=self._loop, name="metrics-flush", daemon=True).start()
+            atexit.register(self.flush, exited=True)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("metrics flush failed")
+
+    def flush(self, exited: bool = False) -> None:
+        path = self._path
+        if path is None or self._pid != os.getpid():
+            return
+        with self._lock:
+            if self._path is None:
+                return
+            if self._written == path and not path.exists():
+                # folded into the archive while this worker looked dead - writing on would count it twice
+                self.app.logger.warning("metrics file %s was archived, starting this worker from zero", path)
+                for metric in _METRICS:
+                    metric.reset()
+                pool_stats.reset()
+            with self.app.app_context():
+                pool = _pool_values()
+            data = {
+                "exited": exited,
+                "metrics": {metric.name: metric.snapshot() for metric in _METRICS},
+                "pool": pool,
+            }
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                temp = path.with_suffix(".tmp")
+                temp.write_text(json.dumps(data), encoding="utf-8")
+                os.replace(temp, path)
+                self._written = path
+            except OSError:
+                self.app.logger.warning("could not write metrics file %s", path)
+
+    def collect(self) -> tuple[dict, dict]:
+        # (metric name -> merged values, merged pool values) over every process
+        self.flush()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "a") as lock_file:
+            # one scrape at a time folds dead workers into the archive
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            archive_path = self.directory / self.ARCHIVE
+            archive = _read_json(archive_path) or {}
+            live, dead = [], []
+            cutoff = time.time() - self.stale_after
+            for path in self.directory.glob("*-*.json"):
+                data = _read_json(path)
+                if data is None:
+                    continue
+                if path != self._path and (data.get("exited") or path.stat().st_mtime < cutoff):
+                    dead.append((path, data))
+                else:
+                    live.append(data)
+
+            if dead:
+                # the archive keeps counters only - a dead worker holds no connections
+                totals, pool = _merge([archive] + [data for _, data in dead], gauges=False)
+                archive = {
+                    "metrics": {metric.name: _snapshot_of(metric, totals[metric.name]) for metric in _METRICS},
+                    "pool": pool,
+                }
+                temp = archive_path.with_suffix(".tmp")
+                temp.write_text(json.dumps(archive), encoding="utf-8")
+                os.replace(temp, archive_path)
+                for path, _ in dead:
+                    path.unlink(missing_ok=True)
+        return _merge(live + [archive], gauges=True)
+
+
+def _merge(documents: list, gauges: bool) -> tuple[dict, dict]:
+    totals = {metric.name: {} for metric in _METRICS}
+    pool = {}
+    for data in documents:
+        snapshots = data.get("metrics", {})
+        for metric in _METRICS:
+            metric.merge(totals[metric.name], snapshots.get(metric.name, []))
+        _add(pool, data.get("pool", {}), _POOL_COUNTERS + (_POOL_GAUGES if gauges else ()))
+    return totals, pool
+
+
+def _snapshot_of(metric, totals: dict) -> list:
+    # merged values back in the shape snapshot() writes
+    if isinstance(metric, Histogram):
+        return [[list(key), counts, total, count] for key, (counts, total, count) in totals.items()]
+    return [[list(key), value] for key, value in totals.items()]
+
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+shared_metrics = SharedMetrics()
+
+
+def render_metrics() -> str:
+    lines = []
+    if shared_metrics.directory is not None:
+        try:
+            totals, pool = shared_metrics.collect()
+        except OSError:
+            shared_metrics.app.logger.warning("could not read the shared metrics directory, "
+                                              "reporting this worker only")
+        else:
+            for metric in _METRICS:
+                lines.extend(metric.render(totals[metric.name]))
+            lines.extend(_render_pool(pool))
+            return "\n".join(lines) + "\n"
+
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    lines.extend(_render_pool(_pool_values()))
+    return "\n".join(lines) + "\n"
+
+
+def _is_local_request() -> bool:
+    # straight from this machine - anything relayed by a reverse proxy counts as remote, even though
+    # the proxy itself connects from loopback
+    if request.headers.get("X-Forwarded-For") or request.headers.get("Forwarded"):
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def init_metrics(app: Flask) -> None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    shared_metrics.init_app(app)
+
+    @app.before_request
+    def start_timer() -> None:
+        shared_metrics.ensure_running()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, request.method)
+            REQUESTS.inc(endpoint, request.method, response.status_code)
+        return response
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # kept on the execution context so a failed statement can't leave a stale start time behind
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERIES.observe(time.perf_counter() - context._metrics_started)
+
+    @app.route("/metrics")
+    def metrics():
+        # prometheus scrape endpoint - needs the bearer token when METRICS_TOKEN is set,
+        # otherwise it is only served to this machine, so a default install doesn't publish it
+        token = app.config.get("METRICS_TOKEN")
+        if token:
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if not hmac.compare_digest(supplied, token):
+                abort(403)
+        elif not _is_local_request():
+            abort(403)
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,140 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from .cards import ensure_cards
+from .models import DashboardCard, FaviconOrigin, WebUIHealth, db
+from .search import ensure_index
+
+
+# one row per applied migration
+schema_version = db.Table(
+    "schema_version",
+    db.Column("version", db.Integer, primary_key=True),
+    db.Column("description", db.String(255), nullable=False),
+    db.Column("applied_at", db.DateTime, nullable=False),
+)
+
+# in dependency order - never add to this, new tables get their own migration
+_BASELINE_TABLES = ("user", "host", "category", "web_ui", "webui_categories", "webui_search")
+
+# seconds to wait for another process to finish migrating before giving up
+LOCK_TIMEOUT = 120
+# longest pause between attempts while waiting for the database to come up at startup
+RETRY_MAX_DELAY = 10
+
+
+def _baseline() -> None:
+    # the tables that existed before versioned migrations, created if missing - existing installs already
+    # have them, so this is a no-op there. pinned by name so later models never leak into version 1
+    tables = [db.metadata.tables[name] for name in _BASELINE_TABLES]
+    db.metadata.create_all(db.engine, tables=tables, checkfirst=True)
+
+
+def _health_table() -> None:
+    # new installs already got it from the baseline
+    WebUIHealth.__table__.create(db.engine, checkfirst=True)
+
+
+def _dashboard_cards() -> None:
+    # new installs already got the table from the baseline, existing ones get it here and are backfilled
+    DashboardCard.__table__.create(db.engine, checkfirst=True)
+    ensure_cards()
+
+
+def _favicon_cache_table() -> None:
+    FaviconOrigin.__table__.create(db.engine, checkfirst=True)
+
+
+# (version, description, function) - append only, never renumber or edit an applied entry
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "backfill search documents", ensure_index),
+    (3, "webui health table", _health_table),
+    (4, "dashboard card read model", _dashboard_cards),
+    (5, "favicon origin cache", _favicon_cache_table),
+]
+
+
+@contextmanager
+def _migration_lock():
+    # mysql/mariadb advisory lock so only one process migrates when several workers start at once
+    # named after the current database so two installs sharing a server dont block each other
+    # other backends (sqlite in dev) run single process, so they go without
+    if db.engine.dialect.name != "mysql":
+        yield
+        return
+
+    with db.engine.connect() as conn:
+        acquired = conn.scalar(
+            text("SELECT GET_LOCK(CONCAT(DATABASE(), '.schema_migrate'), :timeout)"),
+            {"timeout": LOCK_TIMEOUT},
+        )
+        if acquired != 1:
+            raise RuntimeError("Timed out waiting for the schema migration lock.")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(CONCAT(DATABASE(), '.schema_migrate'))"))
+
+
+def run_migrations() -> list[int]:
+    # apply every migration that hasn't been recorded yet, in order - returns the versions applied
+    applied_now = []
+    with _migration_lock():
+        # checked again under the lock, another process may have just finished
+        schema_version.create(db.engine, checkfirst=True)
+        applied = set(db.session.scalars(db.select(schema_version.c.version)))
+
+        for version, description, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate()
+            db.session.execute(schema_version.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.now(timezone.utc),
+            ))
+            db.session.commit()
+            applied_now.append(version)
+
+    return applied_now
+
+
+def migrate_on_startup(wait: float) -> list[int]:
+    # run_migrations, retried with a growing pause for up to `wait` seconds while the database can't be
+    # reached - containers often start before mysql is accepting connections
+    deadline = time.monotonic() + wait
+    delay = 1.0
+    while True:
+        try:
+            return run_migrations()
+        except OperationalError as exc:
+            db.session.rollback()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                current_app.logger.error(
+                    "database still unreachable after %.0fs, giving up on startup migrations: %s", wait, exc.orig)
+                raise
+            current_app.logger.warning(
+                "database not reachable yet, retrying migrations in %.0fs: %s", min(delay, remaining), exc.orig)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, RETRY_MAX_DELAY)
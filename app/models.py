@@ -12,10 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
 from datetime import datetime, timezone
 
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import check_password_hash, generate_password_hash
 
 
 db = SQLAlchemy()
@@ -41,11 +41,23 @@ class User(db.Model):
 
     def set_password(self, password: str) -> None:
         # hashes and stores the password - never store plaintext
-        self.password_hash = generate_password_hash(password)
+        # both go through the bounded hashing pool and may raise HasherBusy
+        # imported here - passwords pulls in metrics, which needs db from this module
+        from .passwords import password_hasher
+
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
         # compare a plaintext attempt against the stored hash
-        return check_password_hash(self.password_hash, password)
+        from .passwords import password_hasher
+
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        # stored with other parameters than PASSWORD_HASH_METHOD
+        from .passwords import password_hasher
+
+        return password_hasher.needs_rehash(self.password_hash)
 
 
 class Host(db.Model):
@@ -88,6 +100,86 @@ class WebUI(db.Model):
         db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), nullable=False
     )
 
-    # lazy=subquery loads categories in the same query to avoid n+1 on the dashboard
-    categories = db.relationship(
-        "Category", secondary=webui_categories, lazy="subquery")
+    # loaded on access - the dashboard reads DashboardCard instead, and bulk paths use selectinload
+    categories = db.relationship("Category", secondary=webui_categories)
+
+
+class WebUISearch(db.Model):
+    # one denormalised search document per webui - name, url, description, host and category names
+    # kept in its own table so search is a single indexed lookup instead of joins + distinct
+    __tablename__ = "webui_search"
+
+    webui_id = db.Column(db.Integer, db.ForeignKey(
+        "web_ui.id", ondelete="CASCADE"), primary_key=True)
+    document = db.Column(db.Text, nullable=False, default="")
+
+    # fulltext is mysql/mariadb only - other backends fall back to a plain scan of this one table
+    __table_args__ = (
+        db.Index("ix_webui_search_document", "document",
+                 mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+
+class WebUIHealth(db.Model):
+    # latest reachability probe per webui - one narrow row, overwritten on every sweep
+    __tablename__ = "webui_health"
+
+    webui_id = db.Column(db.Integer, db.ForeignKey(
+        "web_ui.id", ondelete="CASCADE"), primary_key=True)
+    up = db.Column(db.Boolean, nullable=False)
+    status_code = db.Column(db.SmallInteger)
+    latency_ms = db.Column(db.Integer)
+    # short reason when there was no http response at all (timeout, refused, tls...)
+    error = db.Column(db.String(120))
+    checked_at = db.Column(db.DateTime, nullable=False)
+    last_up_at = db.Column(db.DateTime)
+
+
+class DashboardCard(db.Model):
+    # read model for the dashboard - one row per webui with everything its card shows, host and category
+    # names and the latest health result included, so a host group renders from one ordered scan of this
+    # table with no joins. maintained by cards.py in the same transaction as every write it mirrors
+    __tablename__ = "dashboard_card"
+
+    webui_id = db.Column(db.Integer, db.ForeignKey(
+        "web_ui.id", ondelete="CASCADE"), primary_key=True)
+    host_id = db.Column(db.Integer)
+    host_name = db.Column(db.String(120))
+    name = db.Column(db.String(150), nullable=False)
+    url = db.Column(db.String(768), nullable=False)
+    description = db.Column(db.Text)
+    favicon_url = db.Column(db.String(1024))
+    has_credentials = db.Column(db.Boolean, nullable=False, default=False)
+    # [[id, name], ...] sorted by name, packed as json
+    categories = db.Column(db.Text, nullable=False, default="[]")
+
+    health_up = db.Column(db.Boolean)
+    health_status_code = db.Column(db.SmallInteger)
+    health_latency_ms = db.Column(db.Integer)
+    health_error = db.Column(db.String(120))
+    health_last_up_at = db.Column(db.DateTime)
+
+    # a host group's cards in display order straight off the index
+    __table_args__ = (
+        db.Index("ix_dashboard_card_host_name", "host_id", "name"),
+    )
+
+    @property
+    def category_names(self) -> list[str]:
+        return [name for _, name in json.loads(self.categories)]
+
+
+class FaviconOrigin(db.Model):
+    # favicon resolution results - a found icon or "none on this page" per page (origin plus path, ending in
+    # a slash), plus one row per bare origin (scheme://host[:port]) holding its /favicon.ico fallback, or the
+    # backoff while the origin can't be reached at all
+    # a hit is reused until expires_at, a failure is skipped until then with the wait doubling each time
+    __tablename__ = "favicon_origin"
+
+    origin = db.Column(db.String(255), primary_key=True)
+    # the stored favicon_url to hand out, None while the page or origin is failing
+    icon_url = db.Column(db.String(1024))
+    # consecutive failed resolutions, reset by a hit
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    checked_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
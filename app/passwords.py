@@ -0,0 +1,104 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+
+from flask import Flask
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .metrics import PASSWORD_HASH_REJECTED, PASSWORD_HASHES
+
+
+# werkzeug's own default - scrypt with n=2^15, r=8, p=1, about 32 MiB per hash
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class HasherBusy(RuntimeError):
+    # every hashing slot stayed taken for the whole queue timeout
+    pass
+
+
+def _method_prefix(method: str) -> str:
+    # stored hashes start with their full parameters ("scrypt:32768:8:1$salt$hash"), the configured
+    # method may leave some out ("scrypt"), so take the prefix from what it actually produces
+    # doubles as validation - a bad profile fails here instead of on every login
+    try:
+        return generate_password_hash("", method).split("$", 1)[0]
+    except ValueError as exc:
+        raise ValueError(f"invalid PASSWORD_HASH_METHOD {method!r}: {exc}") from exc
+
+
+class PasswordHasher:
+    # runs password hashing on a few dedicated threads so a burst of logins can't tie up every request
+    # thread (and, with scrypt, a lot of memory) - callers wait at most the queue timeout for a slot
+
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self._executor = None
+        self._slots = None
+        self._timeout = None
+        self._prefix = None
+
+    def init_app(self, app: Flask) -> None:
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        # one throwaway hash at startup, so a bad profile stops the app instead of failing every login
+        self._prefix = _method_prefix(self.method)
+        workers = max(1, app.config["PASSWORD_HASH_WORKERS"])
+        # threads are only spawned on first use, so creating it here is cheap
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # one slot per worker thread - a request waiting for a slot is the queue
+        self._slots = BoundedSemaphore(workers)
+        self._timeout = app.config["PASSWORD_HASH_TIMEOUT"]
+        app.extensions["password_hasher"] = self
+
+    def _run(self, operation: str, fn, *args):
+        if self._executor is None:
+            # not attached to an app (scripts, shell) - just hash inline
+            return fn(*args)
+        if not self._slots.acquire(timeout=self._timeout):
+            PASSWORD_HASH_REJECTED.inc(operation)
+            raise HasherBusy("password hashing is saturated")
+
+        def work():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                PASSWORD_HASHES.observe(time.perf_counter() - started, operation)
+                # released by the worker, so a caller that gave up can't free a slot that's still hashing
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(work)
+        except BaseException:
+            self._slots.release()
+            raise
+        return future.result()
+
+    def hash(self, password: str) -> str:
+        return self._run("hash", generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run("verify", check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        if self._prefix is None:
+            # not attached to an app (scripts, shell) - work it out inline like _run does
+            self._prefix = _method_prefix(self.method)
+        return password_hash.split("$", 1)[0] != self._prefix
+
+
+password_hasher = PasswordHasher()
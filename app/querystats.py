@@ -0,0 +1,104 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import Counter
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+
+from .models import db
+
+
+class RequestQueryStats:
+    # statements run while handling one request
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        # the same sql text run over and over with different params is the classic n+1 shape
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+def _current() -> RequestQueryStats | None:
+    # background threads (favicon jobs, health checks) run outside a request and aren't counted
+    if not has_request_context():
+        return None
+    return g.get("query_stats")
+
+
+def init_query_stats(app: Flask) -> None:
+    # opt-in - adds X-DB-Queries / Server-Timing headers and logs slow or n+1 looking requests
+    if not app.config.get("DB_QUERY_STATS"):
+        return
+
+    slow_ms = app.config["SLOW_REQUEST_MS"]
+    threshold = app.config["N_PLUS_ONE_THRESHOLD"]
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_stats_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current()
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - context._query_stats_started)
+
+    @app.before_request
+    def start_query_stats() -> None:
+        g.query_stats = RequestQueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop("query_stats", None)
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.seconds * 1000
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers.add(
+            "Server-Timing", f'db;dur={db_ms:.1f};desc="{stats.count} queries"')
+        response.headers.add("Server-Timing", f"app;dur={total_ms:.1f}")
+
+        repeated = stats.repeated(threshold)
+        if repeated:
+            response.headers["X-DB-Repeated-Queries"] = str(len(repeated))
+        if total_ms >= slow_ms or repeated:
+            suspects = "; ".join(
+                f"{n}x {' '.join(sql.split())[:120]}" for sql, n in repeated[:3])
+            app.logger.warning(
+                "%s %s %s took %.1fms, db %d queries / %.1fms%s",
+                request.method,
+                request.full_path.rstrip("?"),
+                response.status_code,
+                total_ms,
+                stats.count,
+                db_ms,
+                f", possible n+1: {suspects}" if suspects else "",
+            )
+        return response
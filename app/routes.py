@@ -12,14 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from flask import Blueprint, flash, g, redirect, render_template, request, url_for, jsonify
-from sqlalchemy import func, or_
+import csv
+import io
+
+from flask import Blueprint, Response, abort, flash, g, redirect, render_template, request, send_from_directory, stream_with_context, url_for, jsonify
+from markupsafe import Markup
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
-from .auth import login_required
-from .models import Category, Host, User, WebUI, db
-from .utils import decrypt_secret, encrypt_secret, normalize_url, resolve_favicon
+from .auth import bootstrap_required, fragment_login_required, login_required
+from .cache import bump_generation, conditional_fragment, conditional_page, current_generation, render_cache
+from .cards import refresh_card, refresh_category_cards, refresh_host_cards, remove_card
+from .favicons import FILENAME_RE, favicon_dir, favicon_src, is_local
+from .health import forget_health
+from .jobs import DONE, PENDING, RUNNING, favicon_jobs
+from .models import Category, DashboardCard, Host, WebUI, WebUISearch, db, webui_categories
+from .search import index_webui, reindex_category, reindex_host, remove_webui, search_filter
+from .suggest import suggest_index
+from .transfer import detect_format, export_csv, export_ndjson, import_records, iter_records
+from .utils import decrypt_secret, encrypt_secret, normalize_url
 
 
 main_bp = Blueprint("main", __name__)
@@ -28,7 +40,7 @@ main_bp = Blueprint("main", __name__)
 @main_bp.route("/")
 def index():
     # root just figures out where to send the user - setup, dashboard, or login
-    if db.session.scalar(db.select(func.count()).select_from(User)) == 0:
+    if bootstrap_required():
         return redirect(url_for("auth.setup_admin"))
     if g.get("user"):
         return redirect(url_for("main.webui_list"))
@@ -37,65 +49,60 @@ def index():
 
 @main_bp.route("/dashboard")
 @login_required
+@conditional_page
 def webui_list():
     q = (request.args.get("q") or "").strip()
     host_id = request.args.get("host_id", type=int)
     category_id = request.args.get("category_id", type=int)
 
-    # eager load host and categories so we dont get n+1 queries when rendering cards
-    stmt = db.select(WebUI).options(joinedload(
-        WebUI.host), joinedload(WebUI.categories))
-    # track whether we already joined categories so we dont do it twice
-    categories_joined = False
+    # the rendered filters + cards only change when data does, so serve them from cache until the next write
+    key = (q, host_id, category_id, current_generation())
+    dashboard = render_cache.get(key)
+    if dashboard is None:
+        dashboard = _render_dashboard(q, host_id, category_id)
+        render_cache.put(key, dashboard)
 
-    if q:
-        like = f"%{q}%"
-        # search across name, url, description, host name, and category name
-        stmt = (
-            stmt.outerjoin(WebUI.host)
-            .outerjoin(WebUI.categories)
-            .where(
-                or_(
-                    WebUI.name.ilike(like),
-                    WebUI.url.ilike(like),
-                    WebUI.description.ilike(like),
-                    Host.name.ilike(like),
-                    Category.name.ilike(like),
-                )
-            )
-            .distinct()
-        )
-        categories_joined = True
+    # flashed messages and the nav are rendered fresh around the cached part
+    return render_template("webui_list.html", dashboard=Markup(dashboard))
 
-    if host_id:
-        stmt = stmt.where(WebUI.host_id == host_id)
 
-    if category_id:
-        # only join categories if the search didnt already do it
-        if not categories_joined:
-            stmt = stmt.join(WebUI.categories)
-        stmt = stmt.where(Category.id == category_id)
+def _filter_cards(stmt, q: str, category_id: int | None):
+    # search and category filters shared by the group counts and the per-group cards
+    relevance = None
+    if q:
+        # search goes through the one-row-per-webui search table, joined on its primary key
+        match, relevance = search_filter(q)
+        stmt = stmt.join(WebUISearch, WebUISearch.webui_id ==
+                         DashboardCard.webui_id).where(match)
 
-    # unique is required when using joinedload with scalars - prevents duplicates from the join
-    webuis = db.session.scalars(stmt.order_by(WebUI.name.asc())).unique().all()
+    if category_id:
+        stmt = stmt.where(DashboardCard.webui_id.in_(
+            db.select(webui_categories.c.webui_id).where(
+                webui_categories.c.category_id == category_id)))
+    return stmt, relevance
 
-    # group by host name, sort alpha, unassigned services go at the end
-    grouped = {}
-    for w in webuis:
-        key = w.host.name if w.host else None
-        grouped.setdefault(key, []).append(w)
 
-    host_names = sorted(k for k in grouped if k is not None)
-    groups = [(name, grouped[name]) for name in host_names]
-    if None in grouped:
-        groups.append((None, grouped[None]))
+def _render_dashboard(q: str, host_id: int | None, category_id: int | None) -> str:
+    # only the host group headers and their counts - the cards are fetched per group by the browser,
+    # so this page stays the same size however many services there are
+    stmt = db.select(DashboardCard.host_id, func.count()).group_by(DashboardCard.host_id)
+    stmt, _ = _filter_cards(stmt, q, category_id)
+    if host_id:
+        stmt = stmt.where(DashboardCard.host_id == host_id)
+    counts = dict(db.session.execute(stmt).all())
 
     hosts = db.session.scalars(db.select(Host).order_by(Host.name.asc())).all()
     categories = db.session.scalars(
         db.select(Category).order_by(Category.name.asc())).all()
 
+    # sort alpha by host name, unassigned services go at the end
+    groups = sorted(((host, counts[host.id]) for host in hosts if host.id in counts),
+                    key=lambda group: group[0].name)
+    if None in counts:
+        groups.append((None, counts[None]))
+
     return render_template(
-        "webui_list.html",
+        "partials/dashboard.html",
         groups=groups,
         hosts=hosts,
         categories=categories,
@@ -105,6 +112,37 @@ def webui_list():
     )
 
 
+@main_bp.route("/dashboard/hosts/<int:host_id>/cards")
+@fragment_login_required
+@conditional_fragment
+def dashboard_cards(host_id: int):
+    # cards for one host group (0 is unassigned), with the dashboard's search and category filters applied
+    q = (request.args.get("q") or "").strip()
+    category_id = request.args.get("category_id", type=int)
+
+    key = ("cards", host_id, q, category_id, current_generation())
+    cards = render_cache.get(key)
+    if cards is None:
+        cards = _render_cards(host_id, q, category_id)
+        render_cache.put(key, cards)
+    return cards
+
+
+def _render_cards(host_id: int, q: str, category_id: int | None) -> str:
+    # one ordered range scan of the read model - host and category names and health are already on the row
+    stmt = db.select(DashboardCard).where(
+        DashboardCard.host_id == host_id if host_id else DashboardCard.host_id.is_(None))
+    stmt, relevance = _filter_cards(stmt, q, category_id)
+
+    # matches are ranked by relevance within the group
+    order_by = [DashboardCard.name.asc()]
+    if relevance is not None:
+        order_by.insert(0, relevance.desc())
+
+    cards = db.session.scalars(stmt.order_by(*order_by)).all()
+    return render_template("partials/webui_cards.html", items=cards)
+
+
 def _form_selection_defaults(webui: WebUI | None):
     # on a POST re-render (validation failure), use what the user submitted so values are preserved
     if request.method == "POST":
@@ -153,7 +191,6 @@ def _hydrate_webui(webui: WebUI) -> bool:
             db.select(Category).where(Category.id.in_(category_ids))
         ).all()
 
-    url_changed = url != webui.url
     webui.name = name
     webui.url = url
     webui.description = description
@@ -174,12 +211,6 @@ def _hydrate_webui(webui: WebUI) -> bool:
         if password:
             webui.credential_password_encrypted = encrypt_secret(password)
 
-    # only re-resolve favicon if url changed or we dont have one yet
-    if url_changed or not webui.favicon_url:
-        resolved_favicon = resolve_favicon(url)
-        if resolved_favicon:
-            webui.favicon_url = resolved_favicon
-
     return True
 
 
@@ -197,12 +228,18 @@ def new_webui():
         if _hydrate_webui(webui):
             db.session.add(webui)
             try:
+                index_webui(webui)
+                refresh_card(webui)
                 db.session.commit()
             except IntegrityError:
                 # url collision - the unique constraint on url fired
                 db.session.rollback()
                 flash("A WebUI with that URL already exists.", "error")
             else:
+                bump_generation(names=True)
+                suggest_index.put_webui(webui)
+                # favicon is resolved in the background so the save returns straight away
+                favicon_jobs.submit(webui.id)
                 flash("WebUI created.", "success")
                 return redirect(url_for("main.webui_list"))
 
@@ -216,6 +253,11 @@ def new_webui():
     )
 
 
+def _suggest_text(webui: WebUI) -> tuple:
+    # what the suggestion index keeps for a webui - an edit that leaves these alone doesn't touch it
+    return webui.name, webui.url, webui.host_id, sorted(category.id for category in webui.categories)
+
+
 @main_bp.route("/webuis/<int:webui_id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_webui(webui_id: int):
@@ -229,13 +271,24 @@ def edit_webui(webui_id: int):
     selected_host_id, selected_category_ids = _form_selection_defaults(webui)
 
     if request.method == "POST":
+        old_url = webui.url
+        old_text = _suggest_text(webui)
         if _hydrate_webui(webui):
             try:
+                index_webui(webui)
+                refresh_card(webui)
                 db.session.commit()
             except IntegrityError:
                 db.session.rollback()
                 flash("Could not save changes. URL may already exist.", "error")
             else:
+                names_changed = _suggest_text(webui) != old_text
+                bump_generation(names=names_changed)
+                if names_changed:
+                    suggest_index.put_webui(webui)
+                # only re-resolve favicon if url changed or we dont have a local copy yet
+                if webui.url != old_url or not is_local(webui.favicon_url):
+                    favicon_jobs.submit(webui.id)
                 flash("WebUI updated.", "success")
                 return redirect(url_for("main.webui_list"))
 
@@ -261,18 +314,135 @@ def webui_credentials(webui_id: int):
     })
 
 
+@main_bp.route("/webuis/favicon-status")
+@login_required
+def favicon_status():
+    # polled by the dashboard for cards that are still waiting on a background favicon job
+    ids = [int(item) for item in (request.args.get("ids") or "").split(",")
+           if item.strip().isdigit()][:200]
+    if not ids:
+        return jsonify({"items": {}})
+
+    rows = db.session.execute(
+        db.select(WebUI.id, WebUI.favicon_url).where(WebUI.id.in_(ids))
+    ).all()
+    return jsonify({"items": {
+        str(row.id): {
+            "status": _favicon_status(row.id, row.favicon_url),
+            "favicon_url": favicon_src(row.favicon_url),
+        }
+        for row in rows
+    }})
+
+
+def _favicon_status(webui_id: int, favicon_url: str | None) -> str:
+    # job state is per process, and the poll may land on a worker that never saw the job - the client only
+    # asks about cards it rendered without an icon, so a stored local copy means the job is done wherever it ran
+    status = favicon_jobs.status(webui_id)
+    if status not in (PENDING, RUNNING) and is_local(favicon_url):
+        return DONE
+    return status
+
+
+@main_bp.route("/favicons/<filename>")
+@login_required
+def favicon_file(filename: str):
+    # locally stored icons are content-addressed, so the url changes whenever the bytes do
+    # that lets browsers cache them forever without ever revalidating
+    if not FILENAME_RE.match(filename):
+        abort(404)
+
+    response = send_from_directory(
+        favicon_dir(), filename, max_age=31536000, etag=filename.split(".")[0])
+    response.cache_control.immutable = True
+    # svg icons come from arbitrary hosts - never let them run script on our origin
+    response.headers["Content-Security-Policy"] = "default-src 'none'; style-src 'unsafe-inline'"
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+@main_bp.app_template_global()
+def favicon_url_for(favicon_url: str | None) -> str:
+    return favicon_src(favicon_url)
+
+
 @main_bp.route("/webuis/<int:webui_id>/delete", methods=["POST"])
 @login_required
 def delete_webui(webui_id: int):
     webui = db.get_or_404(WebUI, webui_id)
+    remove_webui(webui.id)
+    remove_card(webui.id)
+    forget_health(webui.id)
     db.session.delete(webui)
     db.session.commit()
+    bump_generation(names=True)
+    suggest_index.drop_webui(webui_id)
     flash("WebUI removed.", "info")
     return redirect(url_for("main.webui_list"))
 
 
+@main_bp.route("/transfer")
+@login_required
+def transfer_page():
+    return render_template("transfer.html")
+
+
+@main_bp.route("/transfer/import", methods=["POST"])
+@login_required
+def import_webuis():
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        flash("Choose a file to import.", "error")
+        return redirect(url_for("main.transfer_page"))
+
+    # werkzeug spools big uploads to disk - read it back a line at a time rather than into memory
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    try:
+        summary = import_records(iter_records(stream, detect_format(upload.filename)))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # batches before the bad line are already committed
+        flash(f"Import stopped, the file could not be read: {exc}", "error")
+        return redirect(url_for("main.transfer_page"))
+
+    # favicons are queued, not resolved inline - whatever doesn't fit in the queue is left for refresh-favicons
+    queued = 0
+    for webui_id in summary["favicon_ids"]:
+        if not favicon_jobs.submit(webui_id):
+            break
+        queued += 1
+
+    flash(
+        f"Imported {summary['created']} new and {summary['updated']} updated WebUI(s); "
+        f"new hosts: {summary['hosts_created']}, new categories: {summary['categories_created']}.",
+        "success" if not summary["errors"] else "info",
+    )
+    if queued < len(summary["favicon_ids"]):
+        flash(f"{len(summary['favicon_ids']) - queued} favicon(s) were not queued, run refresh-favicons to fetch them.", "info")
+    for line_no, error in summary["errors"][:10]:
+        flash(f"Line {line_no}: {error}", "error")
+    if len(summary["errors"]) > 10:
+        flash(f"...and {len(summary['errors']) - 10} more error(s).", "error")
+    return redirect(url_for("main.transfer_page"))
+
+
+@main_bp.route("/transfer/export")
+@login_required
+def export_webuis():
+    # streamed in id batches, so the response starts straight away and memory stays flat
+    if request.args.get("format") == "csv":
+        body, mimetype, extension = export_csv(), "text/csv", "csv"
+    else:
+        body, mimetype, extension = export_ndjson(), "application/x-ndjson", "ndjson"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="webuis.{extension}"'},
+    )
+
+
 @main_bp.route("/hosts", methods=["GET", "POST"])
 @login_required
+@conditional_page
 def hosts_page():
     if request.method == "POST":
         name = (request.form.get("name") or "").strip()
@@ -289,6 +459,8 @@ def hosts_page():
                 db.session.rollback()
                 flash("Host name must be unique.", "error")
             else:
+                bump_generation(names=True)
+                suggest_index.put_named("host", host.id, host.name)
                 flash("Host created.", "success")
                 return redirect(url_for("main.hosts_page"))
 
@@ -310,6 +482,8 @@ def delete_host(host_id: int):
 
     db.session.delete(host)
     db.session.commit()
+    bump_generation(names=True)
+    suggest_index.drop_named("host", host_id)
     flash("Host removed.", "info")
     return redirect(url_for("main.hosts_page"))
 
@@ -328,17 +502,23 @@ def edit_host(host_id: int):
     host.name = name
     host.description = description
     try:
+        # host names are part of every linked service's search document
+        reindex_host(host.id)
+        refresh_host_cards(host.id)
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
         flash("Host name must be unique.", "error")
     else:
+        bump_generation(names=True)
+        suggest_index.put_named("host", host.id, host.name)
         flash("Host updated.", "success")
     return redirect(url_for("main.hosts_page"))
 
 
 @main_bp.route("/categories", methods=["GET", "POST"])
 @login_required
+@conditional_page
 def categories_page():
     if request.method == "POST":
         name = (request.form.get("name") or "").strip()
@@ -355,6 +535,8 @@ def categories_page():
                 db.session.rollback()
                 flash("Category name must be unique.", "error")
             else:
+                bump_generation(names=True)
+                suggest_index.put_named("category", category.id, category.name)
                 flash("Category created.", "success")
                 return redirect(url_for("main.categories_page"))
 
@@ -368,7 +550,6 @@ def categories_page():
 def delete_category(category_id: int):
 
     category = db.get_or_404(Category, category_id)
-    from .models import webui_categories
     linked_count = db.session.scalar(
         db.select(func.count()).select_from(webui_categories).where(
             webui_categories.c.category_id == category_id
@@ -378,6 +559,8 @@ def delete_category(category_id: int):
         return jsonify({"error": f'"{category.name}" is assigned to {linked_count} WebUI(s) and cannot be deleted.'}), 409
     db.session.delete(category)
     db.session.commit()
+    bump_generation(names=True)
+    suggest_index.drop_named("category", category_id)
     flash("Category removed.", "info")
     return redirect(url_for("main.categories_page"))
 
@@ -396,10 +579,14 @@ def edit_category(category_id: int):
     category.name = name
     category.description = description
     try:
+        reindex_category(category.id)
+        refresh_category_cards(category.id)
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
         flash("Category name must be unique.", "error")
     else:
+        bump_generation(names=True)
+        suggest_index.put_named("category", category.id, category.name)
         flash("Category updated.", "success")
     return redirect(url_for("main.categories_page"))
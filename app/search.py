@@ -0,0 +1,152 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+from sqlalchemy import and_, false, func
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import WebUI, WebUISearch, db, webui_categories
+
+
+# innodb ignores words shorter than innodb_ft_min_token_size (3 by default) - those use a like instead
+MIN_FULLTEXT_TOKEN = 3
+
+# split on the same boundaries the fulltext parser uses, which also drops boolean-mode operators
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_document(webui: WebUI) -> str:
+    # everything the dashboard search box matches against, flattened into one lowercase string
+    parts = [webui.name, webui.url, webui.description]
+    if webui.host is not None:
+        parts.append(webui.host.name)
+    parts.extend(category.name for category in webui.categories)
+    return " ".join(part for part in parts if part).lower()
+
+
+def _upsert_documents(webuis) -> None:
+    # one select for all existing rows instead of a merge (and its select) per webui
+    ids = [webui.id for webui in webuis]
+    existing = {
+        row.webui_id: row
+        for row in db.session.scalars(db.select(WebUISearch).where(WebUISearch.webui_id.in_(ids)))
+    }
+    for webui in webuis:
+        document = build_document(webui)
+        row = existing.get(webui.id)
+        if row is None:
+            db.session.add(WebUISearch(webui_id=webui.id, document=document))
+        elif row.document != document:
+            row.document = document
+
+
+def index_webui(webui: WebUI) -> None:
+    # upsert the search row in the current transaction - caller commits
+    index_webuis([webui])
+
+
+def index_webuis(webuis) -> None:
+    # batch form of index_webui - new rows need an id, so flush first when there are any
+    if any(webui.id is None for webui in webuis):
+        db.session.flush()
+    if webuis:
+        _upsert_documents(webuis)
+
+
+def remove_webui(webui_id: int) -> None:
+    db.session.execute(db.delete(WebUISearch).where(
+        WebUISearch.webui_id == webui_id))
+
+
+def _reindex(stmt) -> None:
+    # rebuild documents for every webui matched by stmt, loading relations up front to avoid n+1
+    webuis = db.session.scalars(stmt.options(
+        joinedload(WebUI.host), selectinload(WebUI.categories))).unique().all()
+    if webuis:
+        _upsert_documents(webuis)
+
+
+def reindex_host(host_id: int) -> None:
+    # a host rename changes the document of every service on it
+    _reindex(db.select(WebUI).where(WebUI.host_id == host_id))
+
+
+def reindex_category(category_id: int) -> None:
+    _reindex(db.select(WebUI).where(WebUI.id.in_(
+        db.select(webui_categories.c.webui_id).where(
+            webui_categories.c.category_id == category_id)
+    )))
+
+
+def rebuild_index(batch_size: int = 500) -> int:
+    # full rebuild in id-ordered batches so memory stays flat on big catalogues
+    db.session.execute(db.delete(WebUISearch).where(
+        WebUISearch.webui_id.not_in(db.select(WebUI.id))))
+
+    count = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(WebUI.id).where(WebUI.id > last_id)
+            .order_by(WebUI.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        _reindex(db.select(WebUI).where(WebUI.id.in_(ids)))
+        db.session.commit()
+        # drop the loaded objects so the identity map doesn't grow with the table
+        db.session.expunge_all()
+        count += len(ids)
+        last_id = ids[-1]
+
+    db.session.commit()
+    return count
+
+
+def ensure_index() -> None:
+    # backfill after an upgrade - the search table starts empty on existing databases
+    indexed = db.session.scalar(db.select(func.count()).select_from(WebUISearch))
+    total = db.session.scalar(db.select(func.count()).select_from(WebUI))
+    if indexed != total:
+        rebuild_index()
+
+
+def search_terms(q: str) -> list[str]:
+    return _TOKEN_RE.findall((q or "").lower())
+
+
+def search_filter(q: str):
+    # returns (where clause, relevance expression or None) against WebUISearch for the given query
+    # every term has to match - on mysql as a fulltext word prefix, elsewhere as a substring
+    terms = search_terms(q)
+    if not terms:
+        return false(), None
+
+    if db.engine.dialect.name != "mysql":
+        return and_(*(WebUISearch.document.contains(term, autoescape=True) for term in terms)), None
+
+    clauses = []
+    relevance = None
+    long_terms = [term for term in terms if len(term) >= MIN_FULLTEXT_TOKEN]
+    if long_terms:
+        match = WebUISearch.document.match(
+            " ".join(f"+{term}*" for term in long_terms))
+        clauses.append(match)
+        relevance = match
+    for term in terms:
+        if len(term) < MIN_FULLTEXT_TOKEN:
+            clauses.append(WebUISearch.document.contains(
+                term, autoescape=True))
+    return and_(*clauses), relevance
@@ -0,0 +1,101 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from flask import Flask
+from gunicorn.app.base import BaseApplication
+
+from .metrics import shared_metrics
+from .models import db
+from .startup import run_startup
+
+
+# each worker has its own db pool, render cache and favicon threads, so don't let auto sizing run away
+MAX_AUTO_WORKERS = 8
+
+
+def _cpu_count() -> int:
+    # honour cpu pinning (docker --cpuset-cpus) where the platform exposes it
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    return min(2 * _cpu_count() + 1, MAX_AUTO_WORKERS)
+
+
+def server_options(app: Flask, bind: str | None = None, workers: int | None = None,
+                   threads: int | None = None) -> dict:
+    config = app.config
+    workers = workers or config["WEB_WORKERS"] or default_workers()
+    threads = threads or config["WEB_THREADS"]
+    options = {
+        "bind": bind or config["WEB_BIND"],
+        "workers": workers,
+        # threaded workers so one slow request doesn't hold up everything queued behind it
+        "worker_class": "gthread",
+        "threads": threads,
+        # the app is built and migrated once in the master, workers are forked from it
+        "preload_app": True,
+        "timeout": config["WEB_TIMEOUT"],
+        "graceful_timeout": config["WEB_GRACEFUL_TIMEOUT"],
+        "keepalive": config["WEB_KEEPALIVE"],
+        # recycle workers now and then, jittered so they don't all restart at once
+        "max_requests": config["WEB_MAX_REQUESTS"],
+        "max_requests_jitter": config["WEB_MAX_REQUESTS_JITTER"],
+        "accesslog": "-" if config["WEB_ACCESS_LOG"] else None,
+        "errorlog": "-",
+        "post_fork": _post_fork(app),
+    }
+    # worker heartbeats go through a temp file - keep it off overlayfs/disk inside containers
+    if os.path.isdir("/dev/shm"):
+        options["worker_tmp_dir"] = "/dev/shm"
+    return options
+
+
+def _post_fork(app: Flask):
+    def post_fork(server, worker) -> None:
+        # connections opened in the master (migrations, startup checks) must not be shared across forks
+        # close=False drops them without sending anything down sockets the parent still owns
+        with app.app_context():
+            db.engine.dispose(close=False)
+        # metrics recorded in the master (migrations, startup) must not be counted again by every worker
+        shared_metrics.after_fork()
+
+    return post_fork
+
+
+class _Server(BaseApplication):
+    def __init__(self, app: Flask, options: dict):
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+    def load(self) -> Flask:
+        return self.application
+
+
+def serve(app: Flask, **overrides) -> None:
+    options = server_options(app, **overrides)
+    # migrations and the suggestion index run here, once, so forked workers start with both ready
+    run_startup(app)
+    print(f"Serving on {options['bind']} with {options['workers']} worker(s) x {options['threads']} thread(s).")
+    _Server(app, options).run()
@@ -0,0 +1,49 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from threading import Lock
+
+from flask import Flask
+
+from .migrations import migrate_on_startup
+from .suggest import suggest_index
+
+
+_lock = Lock()
+
+
+def run_startup(app: Flask) -> None:
+    # once per app - serve calls it in the master before forking, any other host on its first request
+    # kept out of create_app so cli commands never wait on the database
+    if app.extensions.get("startup_done"):
+        return
+    with _lock:
+        if app.extensions.get("startup_done"):
+            return
+        with app.app_context():
+            # several workers starting together serialise on a database lock inside run_migrations
+            if app.config.get("AUTO_MIGRATE", True):
+                migrate_on_startup(app.config["MIGRATE_WAIT_TIMEOUT"])
+            # built before the first keystroke, and under serve before forking, so workers start warm
+            suggest_index.rebuild()
+        app.extensions["startup_done"] = True
+
+
+def init_startup(app: Flask) -> None:
+    # registered before every other request hook, so nothing queries a schema that isn't there yet
+    @app.before_request
+    def startup_once() -> None:
+        if not app.extensions.get("startup_done"):
+            run_startup(app)
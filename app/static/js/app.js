@@ -43,18 +43,61 @@ function confirmModal(message) {
   });
 }
 
-document.addEventListener('DOMContentLoaded', () => {
-  document.getElementById('error-modal-dismiss').addEventListener('click', () => hideModal('error-modal'));
+// cards saved without an icon get it from a background job - poll until it lands or we give up
+const faviconPending = new Map();
+let faviconAttempts = 0;
+let faviconTimer = null;
 
-  const logoutBtn = document.getElementById('logout-btn');
-  if (logoutBtn) {
-    logoutBtn.addEventListener('click', () => {
-      fetch(logoutBtn.dataset.url, { method: 'POST' })
-        .then(() => { location.href = logoutBtn.dataset.redirect; });
-    });
-  }
+function pollFavicons() {
+  faviconTimer = null;
+  const faviconStatus = document.getElementById('favicon-status');
+  if (!faviconStatus || !faviconPending.size || faviconAttempts >= 10) return;
+  faviconAttempts += 1;
+  fetch(`${faviconStatus.dataset.url}?ids=${[...faviconPending.keys()].slice(0, 200).join(',')}`)
+    .then(r => r.json())
+    .then(data => {
+      let active = false;
+      Object.entries(data.items || {}).forEach(([id, item]) => {
+        const el = faviconPending.get(id);
+        if (!el) return;
+        if (item.favicon_url) {
+          const img = document.createElement('img');
+          img.src = item.favicon_url;
+          img.alt = 'icon';
+          img.className = 'h-full w-full object-cover';
+          el.replaceChildren(img);
+          faviconPending.delete(id);
+        } else if (item.status === 'pending' || item.status === 'running') {
+          active = true;
+        } else if (item.status === 'idle') {
+          // the job may be running on another worker - keep polling until the attempts run out
+          active = true;
+        } else {
+          faviconPending.delete(id);
+        }
+      });
+      // keep going while jobs are in flight, otherwise just a few quick retries
+      if ((active || faviconAttempts < 3) && !faviconTimer) faviconTimer = setTimeout(pollFavicons, 2000);
+    })
+    .catch(() => {});
+}
 
-  document.querySelectorAll('img[data-fallback]').forEach(img => {
+function watchFavicons(root) {
+  if (!document.getElementById('favicon-status')) return;
+  let added = false;
+  root.querySelectorAll('[data-favicon-id]').forEach(el => {
+    faviconPending.set(el.dataset.faviconId, el);
+    added = true;
+  });
+  if (!added) return;
+  // a newly loaded group gets its own few quick retries
+  faviconAttempts = 0;
+  if (!faviconTimer) faviconTimer = setTimeout(pollFavicons, 1500);
+}
+
+// everything a dashboard card needs wired up - run again for every group of cards inserted later
+function bindCards(root) {
+  root.querySelectorAll('img[data-fallback]').forEach(img => {
     img.addEventListener('error', () => {
       const icon = document.createElement('i');
       icon.className = 'fa-solid fa-globe text-cyan-300';
@@ -62,7 +105,9 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   });
 
-  document.querySelectorAll('button.delete-btn').forEach(btn => {
+  watchFavicons(root);
+
+  root.querySelectorAll('button.delete-btn').forEach(btn => {
     btn.addEventListener('click', async () => {
       if (!await confirmModal(btn.dataset.confirm)) return;
       fetch(btn.dataset.url, { method: 'POST' }).then(r => {
@@ -78,27 +123,7 @@ document.addEventListener('DOMContentLoaded', () => {
     });
   });
 
-  document.querySelectorAll('button.edit-btn').forEach(btn => {
-    btn.addEventListener('click', () => {
-      const card = btn.closest('.edit-card');
-      const display = card.querySelector('.host-display, .category-display');
-      const form = card.querySelector('.edit-form');
-      display.classList.add('hidden');
-      form.classList.remove('hidden');
-    });
-  });
-
-  document.querySelectorAll('button.edit-cancel').forEach(btn => {
-    btn.addEventListener('click', () => {
-      const card = btn.closest('.edit-card');
-      const display = card.querySelector('.host-display, .category-display');
-      const form = card.querySelector('.edit-form');
-      form.classList.add('hidden');
-      display.classList.remove('hidden');
-    });
-  });
-
-  document.querySelectorAll('button.credentials-btn').forEach(btn => {
+  root.querySelectorAll('button.credentials-btn').forEach(btn => {
     const article = btn.closest('article');
     const panel = article.querySelector('.credentials-panel');
     const usernameEl = panel.querySelector('.credentials-username');
@@ -135,4 +160,189 @@ document.addEventListener('DOMContentLoaded', () => {
         : '<i class="fa-solid fa-eye"></i>';
     });
   });
+}
+
+// the dashboard only ships group headers - fetch a group's cards the first time it's open and near the viewport
+function loadGroup(group) {
+  if (group.dataset.state) return;
+  group.dataset.state = 'loading';
+  const cards = group.querySelector('.group-cards');
+  fetch(group.dataset.cardsUrl)
+    .then(r => {
+      if (r.status === 401) {
+        // session expired - reloading the dashboard goes through the login redirect and comes back here
+        location.reload();
+        return new Promise(() => {});
+      }
+      if (!r.ok) throw new Error(r.status);
+      return r.text();
+    })
+    .then(html => {
+      cards.innerHTML = html;
+      cards.style.minHeight = '';
+      group.dataset.state = 'loaded';
+      bindCards(cards);
+    })
+    .catch(() => {
+      // collapsing and reopening the group tries again
+      delete group.dataset.state;
+      cards.querySelector('.group-cards-status').textContent = 'Could not load these WebUIs.';
+    });
+}
+
+function initGroups() {
+  const groups = document.querySelectorAll('details.host-group[data-cards-url]');
+  if (!groups.length) return;
+
+  const observer = 'IntersectionObserver' in window
+    ? new IntersectionObserver(entries => {
+      entries.forEach(entry => {
+        if (entry.isIntersecting && entry.target.open) loadGroup(entry.target);
+      });
+    }, { rootMargin: '600px 0px' })
+    : null;
+
+  groups.forEach(group => {
+    group.addEventListener('toggle', () => {
+      if (group.open) loadGroup(group);
+    });
+    if (observer) {
+      observer.observe(group);
+    } else if (group.open) {
+      loadGroup(group);
+    }
+  });
+}
+
+// search-as-you-type - answers come from an in-memory index on the server, so a short debounce is plenty
+function initSuggest() {
+  const box = document.querySelector('.suggest');
+  if (!box) return;
+  const input = box.querySelector('input');
+  const list = box.querySelector('.suggest-list');
+  const icons = { webui: 'fa-globe', host: 'fa-server', category: 'fa-tag' };
+  const seen = new Map();
+  let timer = null;
+  let controller = null;
+  let active = -1;
+
+  const close = () => {
+    list.classList.add('hidden');
+    active = -1;
+  };
+
+  const render = items => {
+    list.replaceChildren();
+    active = -1;
+    if (!items.length) {
+      close();
+      return;
+    }
+    items.forEach(item => {
+      const link = document.createElement('a');
+      link.href = item.href;
+      link.className = 'flex items-center gap-2 px-3 py-2 hover:bg-slate-800';
+      if (item.type === 'webui') {
+        link.target = '_blank';
+        link.rel = 'noopener noreferrer';
+      }
+      const icon = document.createElement('i');
+      icon.className = `fa-solid ${icons[item.type]} text-xs text-cyan-300`;
+      const name = document.createElement('span');
+      name.textContent = item.name;
+      const detail = document.createElement('span');
+      detail.className = 'ml-auto text-xs text-slate-400';
+      detail.textContent = item.type === 'webui' ? item.host || item.url : item.type;
+      link.append(icon, name, detail);
+      list.append(link);
+    });
+    list.classList.remove('hidden');
+  };
+
+  const lookup = () => {
+    const q = input.value.trim();
+    if (!q) {
+      close();
+      return;
+    }
+    if (seen.has(q)) {
+      render(seen.get(q));
+      return;
+    }
+    // only the latest keystroke's answer matters
+    if (controller) controller.abort();
+    controller = new AbortController();
+    fetch(`${box.dataset.url}?q=${encodeURIComponent(q)}`, { signal: controller.signal })
+      .then(r => r.json())
+      .then(data => {
+        seen.set(q, data.items || []);
+        if (input.value.trim() === q) render(data.items || []);
+      })
+      .catch(() => {});
+  };
+
+  input.addEventListener('input', () => {
+    clearTimeout(timer);
+    timer = setTimeout(lookup, 120);
+  });
+
+  input.addEventListener('keydown', e => {
+    const links = list.querySelectorAll('a');
+    if (list.classList.contains('hidden') || !links.length) return;
+    if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+      e.preventDefault();
+      const step = e.key === 'ArrowDown' ? 1 : -1;
+      active = active < 0 && step < 0 ? links.length - 1 : (active + step + links.length) % links.length;
+      links.forEach((link, i) => link.classList.toggle('suggest-active', i === active));
+    } else if (e.key === 'Enter' && active >= 0) {
+      // enter without a highlighted suggestion still submits the normal search
+      e.preventDefault();
+      links[active].click();
+      close();
+    } else if (e.key === 'Escape') {
+      close();
+    }
+  });
+
+  input.addEventListener('focus', () => {
+    if (input.value.trim()) lookup();
+  });
+  // give a click on a suggestion time to land before the list goes away
+  input.addEventListener('blur', () => setTimeout(close, 150));
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+  document.getElementById('error-modal-dismiss').addEventListener('click', () => hideModal('error-modal'));
+
+  const logoutBtn = document.getElementById('logout-btn');
+  if (logoutBtn) {
+    logoutBtn.addEventListener('click', () => {
+      fetch(logoutBtn.dataset.url, { method: 'POST' })
+        .then(() => { location.href = logoutBtn.dataset.redirect; });
+    });
+  }
+
+  bindCards(document);
+  initGroups();
+  initSuggest();
+
+  document.querySelectorAll('button.edit-btn').forEach(btn => {
+    btn.addEventListener('click', () => {
+      const card = btn.closest('.edit-card');
+      const display = card.querySelector('.host-display, .category-display');
+      const form = card.querySelector('.edit-form');
+      display.classList.add('hidden');
+      form.classList.remove('hidden');
+    });
+  });
+
+  document.querySelectorAll('button.edit-cancel').forEach(btn => {
+    btn.addEventListener('click', () => {
+      const card = btn.closest('.edit-card');
+      const display = card.querySelector('.host-display, .category-display');
+      const form = card.querySelector('.edit-form');
+      form.classList.add('hidden');
+      display.classList.remove('hidden');
+    });
+  });
 });
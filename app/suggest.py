@@ -0,0 +1,323 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from threading import RLock
+
+from .cache import names_stamp
+from .models import Category, Host, WebUI, db, webui_categories
+from .search import search_terms
+
+
+# terms shorter than this only ever match as a prefix - one or two letter substrings match nearly everything
+MIN_GRAM_TERM = 3
+# share of a term's trigrams an entry needs to count as a fuzzy (typo) match
+FUZZY_THRESHOLD = 0.6
+# distinct words scanned per prefix, so a one letter prefix can't turn a lookup into a full scan
+MAX_CANDIDATES = 2000
+# once this few entries are left, later terms are checked against them directly
+FILTER_BELOW = 300
+
+_SCHEME_RE = re.compile(r"^[a-z][a-z0-9+.-]*://")
+
+# how a term matched - prefix of a name word beats prefix of anything else beats a substring beats a typo
+_NAME_PREFIX = 3.0
+_PREFIX = 2.0
+_SUBSTRING = 1.5
+
+
+def _grams(token: str) -> set[str]:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class _Entry:
+    __slots__ = ("kind", "id", "name", "url", "host_id", "category_ids",
+                 "sort_name", "name_tokens", "tokens", "text", "grams")
+
+    def __init__(self, kind: str, id: int, name: str, url: str | None = None,
+                 host_id: int | None = None, category_ids: tuple = ()):
+        self.kind = kind
+        self.id = id
+        self.name = name
+        self.url = url
+        self.host_id = host_id
+        self.category_ids = category_ids
+
+
+class SuggestIndex:
+    # in-memory index of webui names and urls, host names and category names for the search box
+    # lookups never touch the database - the write routes keep it up to date as they commit, and a write
+    # made by another process (worker, cli) is picked up from the names stamp with a rebuild
+
+    def __init__(self):
+        self._lock = RLock()
+        self._stamp = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._entries = {}
+        # token -> entry keys, plus the distinct tokens in sorted order for prefix range scans
+        self._postings = {}
+        # same, for tokens of the name alone - a name match ranks above a url/host/category one
+        self._name_postings = {}
+        self._sorted_tokens = []
+        # trigram -> entry keys, for substring and fuzzy matches
+        self._gram_postings = {}
+
+    # ---- maintenance ----
+
+    def rebuild(self) -> int:
+        # four plain selects, no orm objects - a few ms even on big catalogues
+        # the stamp is read first, so anything written while this runs triggers another rebuild
+        stamp = names_stamp.mtime_ns()
+        webuis = db.session.execute(db.select(WebUI.id, WebUI.name, WebUI.url, WebUI.host_id)).all()
+        hosts = db.session.execute(db.select(Host.id, Host.name)).all()
+        categories = db.session.execute(db.select(Category.id, Category.name)).all()
+        links = {}
+        for webui_id, category_id in db.session.execute(
+                db.select(webui_categories.c.webui_id, webui_categories.c.category_id)):
+            links.setdefault(webui_id, []).append(category_id)
+        db.session.rollback()
+
+        with self._lock:
+            self._reset()
+            # hosts and categories first, webui entries include their names
+            for row in hosts:
+                self._add(_Entry("host", row.id, row.name), keep_sorted=False)
+            for row in categories:
+                self._add(_Entry("category", row.id, row.name), keep_sorted=False)
+            for row in webuis:
+                self._add(_Entry("webui", row.id, row.name, row.url, row.host_id, tuple(links.get(row.id, ()))),
+                          keep_sorted=False)
+            # one sort instead of an insort per new token
+            self._sorted_tokens = sorted(self._postings)
+            self._stamp = stamp
+        return len(webuis)
+
+    def invalidate(self) -> None:
+        # for bulk changes (imports) - cheaper to rebuild on the next lookup than to apply them one by one
+        with self._lock:
+            self._stamp = None
+
+    def put_webui(self, webui: WebUI) -> None:
+        # call after committing a create or edit
+        entry = _Entry("webui", webui.id, webui.name, webui.url, webui.host_id,
+                       tuple(category.id for category in webui.categories))
+        with self._lock:
+            self._discard(("webui", webui.id))
+            self._add(entry)
+
+    def drop_webui(self, webui_id: int) -> None:
+        with self._lock:
+            self._discard(("webui", webui_id))
+
+    def put_named(self, kind: str, item_id: int, name: str) -> None:
+        # hosts and categories - a rename also changes the text of every webui using them
+        with self._lock:
+            self._discard((kind, item_id))
+            self._add(_Entry(kind, item_id, name))
+            for entry in self._users_of(kind, item_id):
+                self._discard((entry.kind, entry.id))
+                self._add(entry)
+
+    def drop_named(self, kind: str, item_id: int) -> None:
+        # only called for hosts/categories nothing is assigned to, so no webui entries change
+        with self._lock:
+            self._discard((kind, item_id))
+
+    def _users_of(self, kind: str, item_id: int) -> list[_Entry]:
+        if kind == "host":
+            return [entry for entry in self._entries.values()
+                    if entry.kind == "webui" and entry.host_id == item_id]
+        return [entry for entry in self._entries.values()
+                if entry.kind == "webui" and item_id in entry.category_ids]
+
+    def _add(self, entry: _Entry, keep_sorted: bool = True) -> None:
+        parts = [entry.name]
+        if entry.kind == "webui":
+            parts.append(_SCHEME_RE.sub("", entry.url.lower()))
+            host = self._entries.get(("host", entry.host_id))
+            if host is not None:
+                parts.append(host.name)
+            for category_id in entry.category_ids:
+                category = self._entries.get(("category", category_id))
+                if category is not None:
+                    parts.append(category.name)
+
+        entry.text = " ".join(parts).lower()
+        entry.sort_name = entry.name.lower()
+        entry.name_tokens = frozenset(search_terms(entry.name))
+        entry.tokens = frozenset(search_terms(entry.text))
+        entry.grams = frozenset(gram for token in entry.tokens for gram in _grams(token))
+
+        key = (entry.kind, entry.id)
+        self._entries[key] = entry
+        for token in entry.tokens:
+            keys = self._postings.get(token)
+            if keys is None:
+                keys = self._postings[token] = set()
+                if keep_sorted:
+                    insort(self._sorted_tokens, token)
+            keys.add(key)
+        for token in entry.name_tokens:
+            self._name_postings.setdefault(token, set()).add(key)
+        for gram in entry.grams:
+            self._gram_postings.setdefault(gram, set()).add(key)
+
+    def _discard(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for token in entry.tokens:
+            keys = self._postings[token]
+            keys.discard(key)
+            if not keys:
+                del self._postings[token]
+                del self._sorted_tokens[bisect_left(self._sorted_tokens, token)]
+        for token in entry.name_tokens:
+            keys = self._name_postings[token]
+            keys.discard(key)
+            if not keys:
+                del self._name_postings[token]
+        for gram in entry.grams:
+            keys = self._gram_postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self._gram_postings[gram]
+
+    def _ensure_current(self) -> None:
+        stamp = self._stamp
+        if stamp is not None:
+            elsewhere, current = names_stamp.changed_elsewhere(stamp)
+            if not elsewhere:
+                if current != stamp:
+                    # only this process wrote since, and those writes are applied already - move up to the
+                    # current stamp so later lookups don't walk the chain, or rebuild once it is evicted
+                    with self._lock:
+                        if self._stamp == stamp:
+                            self._stamp = current
+                return
+        with self._lock:
+            if self._stamp is None or names_stamp.changed_elsewhere(self._stamp)[0]:
+                self.rebuild()
+
+    # ---- lookups ----
+
+    def _prefix_keys(self, term: str) -> tuple[set, set]:
+        # (entries with a name word starting with term, entries with any word starting with it)
+        name_keys, keys = set(), set()
+        start = bisect_left(self._sorted_tokens, term)
+        for token in self._sorted_tokens[start:start + MAX_CANDIDATES]:
+            if not token.startswith(term):
+                break
+            keys |= self._postings[token]
+            name_keys |= self._name_postings.get(token, set())
+        return name_keys, keys
+
+    def _substring_keys(self, term: str) -> set:
+        # every trigram of the term has to be there, then the text is checked for the real thing
+        postings = sorted((self._gram_postings.get(gram, set()) for gram in _grams(term)), key=len)
+        keys = set(postings[0]).intersection(*postings[1:])
+        return {key for key in keys if term in self._entries[key].text}
+
+    def _fuzzy_keys(self, term: str) -> dict:
+        # entry key -> share of the term's trigrams it has, for typos ("jelyfin")
+        grams = _grams(term)
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._gram_postings.get(gram, ()))
+        needed = max(3, len(grams) * FUZZY_THRESHOLD)
+        return {key: count / len(grams) for key, count in counts.items() if count >= needed}
+
+    def _match(self, terms: list[str], limit: int, fuzzy: bool) -> tuple[set, list]:
+        # entries matching every term, and per term the sets needed to score them
+        matches = None
+        matchers = []
+        # longest first - it's usually the most selective, so the intersection shrinks quickly
+        for term in sorted(terms, key=len, reverse=True):
+            if matches is not None and len(matches) <= FILTER_BELOW:
+                # few enough left that checking them beats scanning every word with this prefix
+                name_keys, prefix_keys = self._filter_prefix(matches, term)
+            else:
+                name_keys, prefix_keys = self._prefix_keys(term)
+                if matches is not None:
+                    prefix_keys &= matches
+            substring_keys, typo_keys = set(), {}
+            # prefix matches rank higher, so the slower lookups only run when those don't fill the list
+            if len(term) >= MIN_GRAM_TERM and len(prefix_keys) < limit:
+                substring_keys = self._substring_keys(term)
+                if fuzzy:
+                    typo_keys = self._fuzzy_keys(term)
+            keys = prefix_keys | substring_keys | typo_keys.keys()
+            matches = keys if matches is None else matches & keys
+            matchers.append((name_keys, prefix_keys, substring_keys, typo_keys))
+            if not matches:
+                break
+        return matches, matchers
+
+    def _filter_prefix(self, keys: set, term: str) -> tuple[set, set]:
+        name_keys, prefix_keys = set(), set()
+        for key in keys:
+            entry = self._entries[key]
+            if any(token.startswith(term) for token in entry.tokens):
+                prefix_keys.add(key)
+                if any(token.startswith(term) for token in entry.name_tokens):
+                    name_keys.add(key)
+        return name_keys, prefix_keys
+
+    def search(self, q: str, limit: int = 8) -> list[dict]:
+        terms = search_terms(q)
+        if not terms:
+            return []
+        self._ensure_current()
+
+        with self._lock:
+            matches, matchers = self._match(terms, limit, fuzzy=False)
+            # typo tolerance only kicks in when the exact matches don't fill the list
+            if len(matches) < limit:
+                matches, matchers = self._match(terms, limit, fuzzy=True)
+
+            phrase = " ".join(terms)
+            ranked = []
+            for key in matches:
+                entry = self._entries[key]
+                score = 0.0
+                for name_keys, prefix_keys, substring_keys, typo_keys in matchers:
+                    if key in name_keys:
+                        score += _NAME_PREFIX
+                    elif key in prefix_keys:
+                        score += _PREFIX
+                    elif key in substring_keys:
+                        score += _SUBSTRING
+                    else:
+                        score += typo_keys[key]
+                if entry.sort_name.startswith(phrase):
+                    score += 1
+                ranked.append((-score, entry.kind != "webui", len(entry.sort_name), entry.sort_name, key))
+
+            return [self._item(self._entries[item[-1]]) for item in heapq.nsmallest(limit, ranked)]
+
+    def _item(self, entry: _Entry) -> dict:
+        item = {"type": entry.kind, "id": entry.id, "name": entry.name}
+        if entry.kind == "webui":
+            host = self._entries.get(("host", entry.host_id))
+            item["url"] = entry.url
+            item["host"] = host.name if host is not None else None
+        return item
+
+
+suggest_index = SuggestIndex()
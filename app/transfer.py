@@ -0,0 +1,408 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import csv
+import io
+import json
+import re
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from .cache import bump_generation
+from .cards import refresh_cards
+from .favicons import is_local
+from .models import Category, Host, WebUI, db, webui_categories
+from .search import index_webuis
+from .suggest import suggest_index
+from .utils import decrypt_secret, encrypt_secret, extract_host, normalize_url
+
+
+# records are streamed in and out in batches of this size - one transaction (and one commit) per batch
+BATCH_SIZE = 200
+
+# columns of the csv format - webuis only, hosts and categories are referenced by name
+CSV_FIELDS = (
+    "name",
+    "url",
+    "description",
+    "host",
+    "categories",
+    "credential_username",
+    "credential_password_encrypted",
+    "credential_password",
+)
+# categories share one csv cell
+CSV_CATEGORY_SEPARATOR = ";"
+
+_PORT_RE = re.compile(r":\d+$")
+
+
+class _RecordError(ValueError):
+    pass
+
+
+# ---- import ----
+
+def detect_format(filename: str | None) -> str:
+    return "csv" if (filename or "").lower().endswith(".csv") else "ndjson"
+
+
+def _ndjson_records(stream):
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_no, None, f"invalid json: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "expected one json object per line"
+            continue
+        yield line_no, record, None
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(stream)
+    # header is line 1, so data starts on line 2
+    # every column in the header counts as present, so an empty host cell means unassigned like in ndjson
+    for line_no, row in enumerate(reader, 2):
+        yield line_no, {key: value for key, value in row.items() if key}, None
+
+
+def iter_records(stream, fmt: str):
+    # (line number, record or None, error or None) - the file is read line by line, never all at once
+    if fmt == "csv":
+        return _csv_records(stream)
+    return _ndjson_records(stream)
+
+
+def _text(record: dict, key: str, limit: int | None = None) -> str:
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise _RecordError(f"{key} must be a string")
+    value = value.strip()
+    if limit is not None and len(value) > limit:
+        raise _RecordError(f"{key} is longer than {limit} characters")
+    return value
+
+
+def _auto_host_name(url: str) -> str:
+    # same netloc extract_host gives everywhere else, minus the port - services on one box share a host
+    return _PORT_RE.sub("", extract_host(url))
+
+
+def _parse_webui(record: dict) -> dict:
+    name = _text(record, "name", 150)
+    url = normalize_url(_text(record, "url"))
+    if not name or not url:
+        raise _RecordError("name and url are required")
+    if len(url) > 768:
+        raise _RecordError("url is longer than 768 characters")
+
+    # a missing host key means "work it out from the url", an explicit null/empty one means unassigned
+    if "host" in record:
+        host = _text(record, "host", 120) or None
+    else:
+        host = _auto_host_name(url)[:120] or None
+
+    categories = record.get("categories") or []
+    if isinstance(categories, str):
+        categories = categories.split(CSV_CATEGORY_SEPARATOR)
+    if not isinstance(categories, list) or not all(isinstance(item, str) for item in categories):
+        raise _RecordError("categories must be a list of names")
+    categories = sorted({item.strip() for item in categories if item.strip()})
+    if any(len(item) > 120 for item in categories):
+        raise _RecordError("category names are limited to 120 characters")
+
+    parsed = {
+        "name": name,
+        "url": url,
+        "description": _text(record, "description"),
+        "host": host,
+        "categories": categories,
+    }
+
+    # credentials are only touched when the record mentions them, so re-importing keeps what's stored
+    if "credential_username" in record:
+        parsed["credential_username"] = _text(record, "credential_username", 255)
+    password = record.get("credential_password")
+    token = record.get("credential_password_encrypted")
+    if password:
+        if not isinstance(password, str):
+            raise _RecordError("credential_password must be a string")
+        parsed["credential_password_encrypted"] = encrypt_secret(password)
+    elif token:
+        # exports carry the ciphertext - it's only any use if one of our keys can read it
+        if not isinstance(token, str):
+            raise _RecordError("credential_password_encrypted must be a string")
+        if decrypt_secret(token) is None:
+            raise _RecordError(
+                "credential_password_encrypted can't be decrypted with the configured keys "
+                "(add the exporting instance's key to APP_CREDENTIALS_PREVIOUS_KEYS)")
+        parsed["credential_password_encrypted"] = token
+    return parsed
+
+
+class _Importer:
+    def __init__(self):
+        # name -> id, filled lazily so each host/category is looked up at most once per import
+        self.hosts = {}
+        self.categories = {}
+        self.summary = {
+            "created": 0,
+            "updated": 0,
+            "hosts_created": 0,
+            "categories_created": 0,
+            "errors": [],
+            "favicon_ids": [],
+        }
+
+    def _resolve(self, model, cache: dict, names: set, counter: str, descriptions: dict | None = None) -> None:
+        missing = [name for name in names if name not in cache]
+        if not missing:
+            return
+        # mysql compares names case-insensitively, so "Proxmox" in the file may match "proxmox" in the table
+        found = {}
+        for row in db.session.execute(db.select(model.id, model.name).where(model.name.in_(missing))):
+            found[row.name] = row.id
+            found.setdefault(row.name.lower(), row.id)
+
+        created = {}
+        pending = []
+        for name in missing:
+            row_id = found.get(name, found.get(name.lower()))
+            if row_id is not None:
+                cache[name] = row_id
+                continue
+            obj = created.get(name.lower())
+            if obj is None:
+                obj = created[name.lower()] = model(name=name, description=(descriptions or {}).get(name, ""))
+                db.session.add(obj)
+            pending.append((name, obj))
+        if created:
+            db.session.flush()
+            for name, obj in pending:
+                cache[name] = obj.id
+            self.summary[counter] += len(created)
+
+    def add_named(self, model, rows: list[dict]) -> None:
+        # explicit host/category records - created when missing, descriptions updated when given
+        cache = self.hosts if model is Host else self.categories
+        counter = "hosts_created" if model is Host else "categories_created"
+        descriptions = {row["name"]: row["description"] for row in rows}
+        self._resolve(model, cache, set(descriptions), counter, descriptions)
+        updates = {cache[name]: description for name, description in descriptions.items() if description}
+        if updates:
+            db.session.execute(db.update(model), [
+                {"id": row_id, "description": description} for row_id, description in updates.items()])
+
+    def add_webuis(self, rows: list[dict]) -> None:
+        # later rows for the same url win field by field, same as importing them one after another would
+        by_url = {}
+        for row in rows:
+            by_url[row["url"]] = {**by_url.get(row["url"], {}), **row}
+        self._resolve(Host, self.hosts, {row["host"] for row in by_url.values() if row["host"]}, "hosts_created")
+        self._resolve(Category, self.categories,
+                      {name for row in by_url.values() for name in row["categories"]}, "categories_created")
+
+        existing = {}
+        for webui in db.session.scalars(
+            db.select(WebUI).options(joinedload(WebUI.host), selectinload(WebUI.categories))
+            .where(WebUI.url.in_(list(by_url)))
+        ).unique():
+            existing[webui.url] = webui
+            existing.setdefault(webui.url.lower(), webui)
+        category_ids = {cid for row in by_url.values() for cid in (self.categories[n] for n in row["categories"])}
+        category_objs = {
+            category.id: category
+            for category in db.session.scalars(db.select(Category).where(Category.id.in_(category_ids)))
+        } if category_ids else {}
+        host_objs = {
+            host.id: host
+            for host in db.session.scalars(db.select(Host).where(
+                Host.id.in_({self.hosts[row["host"]] for row in by_url.values() if row["host"]})))
+        }
+
+        touched = []
+        new = []
+        for url, row in by_url.items():
+            webui = existing.get(url, existing.get(url.lower()))
+            if webui is None:
+                webui = WebUI(url=url)
+                db.session.add(webui)
+                new.append(webui)
+            webui.name = row["name"]
+            webui.description = row["description"]
+            webui.host = host_objs[self.hosts[row["host"]]] if row["host"] else None
+            webui.categories = [category_objs[self.categories[name]] for name in row["categories"]]
+            if "credential_username" in row:
+                webui.credential_username = row["credential_username"]
+            if "credential_password_encrypted" in row:
+                webui.credential_password_encrypted = row["credential_password_encrypted"]
+            touched.append(webui)
+
+        index_webuis(touched)
+        refresh_cards(touched)
+        self.summary["created"] += len(new)
+        self.summary["updated"] += len(touched) - len(new)
+        self.summary["favicon_ids"].extend(
+            webui.id for webui in touched if not is_local(webui.favicon_url))
+
+
+def import_records(records, batch_size: int = BATCH_SIZE) -> dict:
+    # upserts webuis on url in batches, creating hosts and categories as they're referenced
+    # favicons are not resolved here - the caller queues summary["favicon_ids"]
+    importer = _Importer()
+    pending = {"host": [], "category": [], "webui": []}
+    pending_lines = []
+
+    def flush():
+        if not pending_lines:
+            return
+        counts = {key: value for key, value in importer.summary.items() if isinstance(value, int)}
+        queued = len(importer.summary["favicon_ids"])
+        try:
+            if pending["host"]:
+                importer.add_named(Host, pending["host"])
+            if pending["category"]:
+                importer.add_named(Category, pending["category"])
+            if pending["webui"]:
+                importer.add_webuis(pending["webui"])
+            db.session.commit()
+        except Exception as exc:
+            # one bad batch shouldn't take the rest of the file down with it
+            db.session.rollback()
+            # forget everything this batch counted or cached - none of it was committed
+            importer.summary.update(counts)
+            del importer.summary["favicon_ids"][queued:]
+            importer.hosts.clear()
+            importer.categories.clear()
+            importer.summary["errors"].append(
+                (pending_lines[0], f"batch ending on line {pending_lines[-1]} failed: {exc}"))
+        else:
+            bump_generation(names=True)
+            suggest_index.invalidate()
+        # drop loaded objects so the identity map doesn't grow with the file
+        db.session.expunge_all()
+        for items in pending.values():
+            items.clear()
+        pending_lines.clear()
+
+    for line_no, record, error in records:
+        if error is None:
+            kind = record.get("type", "webui")
+            try:
+                if kind == "webui":
+                    pending["webui"].append(_parse_webui(record))
+                elif kind in ("host", "category"):
+                    name = _text(record, "name", 120)
+                    if not name:
+                        raise _RecordError("name is required")
+                    pending[kind].append({"name": name, "description": _text(record, "description")})
+                else:
+                    raise _RecordError(f"unknown record type {kind!r}")
+            except _RecordError as exc:
+                error = str(exc)
+        if error is not None:
+            importer.summary["errors"].append((line_no, error))
+            continue
+        pending_lines.append(line_no)
+        if len(pending_lines) >= batch_size:
+            flush()
+    flush()
+    return importer.summary
+
+
+# ---- export ----
+
+def _batched(stmt, id_column, batch_size: int):
+    # keyset batches by id so the whole table is never loaded at once
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            stmt.where(id_column > last_id).order_by(id_column).limit(batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def export_records(batch_size: int = 500, include_named: bool = True):
+    # hosts and categories first so an import recreates them (with descriptions) before the webuis
+    if include_named:
+        for model, kind in ((Host, "host"), (Category, "category")):
+            stmt = db.select(model.id, model.name, model.description)
+            for rows in _batched(stmt, model.id, batch_size):
+                for row in rows:
+                    yield {"type": kind, "name": row.name, "description": row.description or ""}
+
+    stmt = db.select(
+        WebUI.id,
+        WebUI.name,
+        WebUI.url,
+        WebUI.description,
+        Host.name.label("host_name"),
+        WebUI.credential_username,
+        WebUI.credential_password_encrypted,
+    ).outerjoin(Host, Host.id == WebUI.host_id)
+    for rows in _batched(stmt, WebUI.id, batch_size):
+        categories = {}
+        for webui_id, name in db.session.execute(
+            db.select(webui_categories.c.webui_id, Category.name)
+            .join(Category, Category.id == webui_categories.c.category_id)
+            .where(webui_categories.c.webui_id.in_([row.id for row in rows]))
+            .order_by(Category.name)
+        ):
+            categories.setdefault(webui_id, []).append(name)
+
+        for row in rows:
+            record = {
+                "type": "webui",
+                "name": row.name,
+                "url": row.url,
+                "description": row.description or "",
+                "host": row.host_name,
+                "categories": categories.get(row.id, []),
+            }
+            if row.credential_username:
+                record["credential_username"] = row.credential_username
+            # the password never leaves encrypted - it's only readable with this instance's key
+            if row.credential_password_encrypted:
+                record["credential_password_encrypted"] = row.credential_password_encrypted
+            yield record
+        # release the connection between batches when streaming to a slow client
+        db.session.commit()
+
+
+def export_ndjson(batch_size: int = 500):
+    for record in export_records(batch_size):
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def export_csv(batch_size: int = 500):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS[:-1], extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for record in export_records(batch_size, include_named=False):
+        writer.writerow({**record, "categories": CSV_CATEGORY_SEPARATOR.join(record["categories"])})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
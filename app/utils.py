@@ -14,14 +14,23 @@
 
 from flask import current_app
 import base64
+import codecs
 import hashlib
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from functools import lru_cache
 from html.parser import HTMLParser
 from typing import Optional
 from urllib.parse import urlparse, urljoin
 
 import requests
 import urllib3
-from cryptography.fernet import Fernet, InvalidToken
+from requests.adapters import HTTPAdapter
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from .metrics import FAVICON_RESOLUTIONS
 
 # self-signed certs are common in homelabs - suppress the noise
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -31,9 +40,14 @@ class _IconParser(HTMLParser):
     def __init__(self):
         super().__init__()
         self.hrefs = []
+        # set once the <head> is over - icon links after that don't count, so reading can stop
+        self.done = False
 
     def handle_starttag(self, tag, attrs):
         # collect href values from any <link> tag with "icon" in the rel attribute
+        if tag.lower() == "body":
+            self.done = True
+            return
         if tag.lower() != "link":
             return
 
@@ -43,6 +57,10 @@ class _IconParser(HTMLParser):
         if href and "icon" in rel_value:
             self.hrefs.append(href)
 
+    def handle_endtag(self, tag):
+        if tag.lower() == "head":
+            self.done = True
+
 
 def normalize_url(raw_url: str) -> str:
     # add http:// if the url doesn't already have a scheme
@@ -55,20 +73,50 @@ def normalize_url(raw_url: str) -> str:
     return value
 
 
+def interleave_by_host(rows):
+    # round-robin rows with a .url across hosts so a pool isn't filled with workers all waiting on the same box
+    by_host = defaultdict(deque)
+    for row in rows:
+        by_host[urlparse(normalize_url(row.url)).hostname or ""].append(row)
+
+    queues = deque(by_host.values())
+    while queues:
+        queue = queues.popleft()
+        yield queue.popleft()
+        if queue:
+            queues.append(queue)
+
+
 def extract_host(value: str) -> str:
     # pull just the netloc part out of a url
     parsed = urlparse(normalize_url(value))
     return parsed.netloc
 
 
-def _fernet() -> Fernet:
-    # derive a valid fernet key from the app secret using sha256
-    # falls back to SECRET_KEY if APP_CREDENTIALS_KEY isn't set
+@lru_cache(maxsize=16)
+def derive_fernet(source: str) -> Fernet:
+    # derive a valid fernet key from an arbitrary secret using sha256
+    # cached because encrypt/decrypt run per row and the key only changes on restart
+    digest = hashlib.sha256(source.encode("utf-8")).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+@lru_cache(maxsize=4)
+def _multi_fernet(sources: tuple[str, ...]) -> MultiFernet:
+    return MultiFernet([derive_fernet(source) for source in sources])
+
+
+def credential_key_sources() -> tuple[str, ...]:
+    # current key first (falls back to SECRET_KEY if APP_CREDENTIALS_KEY isn't set), then any retired keys
     configured_key = current_app.config.get("APP_CREDENTIALS_KEY")
-    source = configured_key or current_app.secret_key
-    digest = hashlib.sha256(str(source).encode("utf-8")).digest()
-    key = base64.urlsafe_b64encode(digest)
-    return Fernet(key)
+    current = str(configured_key or current_app.secret_key)
+    previous = current_app.config.get("APP_CREDENTIALS_PREVIOUS_KEYS") or ()
+    return (current, *previous)
+
+
+def _fernet() -> MultiFernet:
+    # encrypts with the current key, decrypts with any of them - so a key change doesn't lose data
+    return _multi_fernet(credential_key_sources())
 
 
 def encrypt_secret(secret: Optional[str]) -> Optional[str]:
@@ -87,75 +135,201 @@ def decrypt_secret(secret: Optional[str]) -> Optional[str]:
         return None
 
 
-def _validate_image(candidate_url: str, timeout: int = 4) -> bool:
+# candidates we recognise as images even when the server sends a useless content-type
+_IMAGE_EXTENSIONS = (".ico", ".png", ".jpg", ".jpeg", ".svg", ".webp")
+
+# most of a page we read looking for icon links - enough for any real <head>, and reading stops at </head>
+HEAD_MAX_BYTES = 150 * 1024
+HEAD_CHUNK_BYTES = 8192
+
+# one shared session so probes reuse keep-alive connections instead of opening a new socket per call
+_http = requests.Session()
+_http.verify = False
+_http_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0)
+_http.mount("http://", _http_adapter)
+_http.mount("https://", _http_adapter)
+
+# bounded pool for validating candidates in parallel - threads are only spawned on first use
+_probe_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="favicon-probe")
+
+
+def _time_left(expires: float, timeout: float) -> float:
+    # per-call timeout, clipped so no single call can run past the overall deadline
+    return max(0.0, min(timeout, expires - time.monotonic()))
+
+
+def _validate_image(candidate_url: str, timeout: float = 4, expires: Optional[float] = None) -> bool:
+    if expires is None:
+        expires = time.monotonic() + timeout * 2
+
+    remaining = _time_left(expires, timeout)
+    if remaining <= 0:
+        return False
+
     # try head first since it's cheaper, fall back to get if that fails
     try:
-        head = requests.head(candidate_url, timeout=timeout,
-                             allow_redirects=True, verify=False)
+        head = _http.head(candidate_url, timeout=remaining, allow_redirects=True)
         if head.status_code < 400:
             content_type = (head.headers.get("content-type") or "").lower()
-            return "image" in content_type or candidate_url.lower().endswith(
-                (".ico", ".png", ".jpg", ".jpeg", ".svg", ".webp")
-            )
+            return "image" in content_type or candidate_url.lower().endswith(_IMAGE_EXTENSIONS)
     except requests.RequestException:
         pass
 
+    remaining = _time_left(expires, timeout)
+    if remaining <= 0:
+        return False
+
     try:
         # some servers dont respond to head - do a streaming get so we dont download the whole thing
-        get_resp = requests.get(
-            candidate_url, timeout=timeout, stream=True, verify=False)
-        content_type = (get_resp.headers.get("content-type") or "").lower()
-        return get_resp.status_code < 400 and (
-            "image" in content_type
-            or candidate_url.lower().endswith((".ico", ".png", ".jpg", ".jpeg", ".svg", ".webp"))
-        )
+        # closed on the way out, the body is never read so the connection would otherwise stay checked out
+        with _http.get(candidate_url, timeout=remaining, stream=True) as get_resp:
+            content_type = (get_resp.headers.get("content-type") or "").lower()
+            return get_resp.status_code < 400 and (
+                "image" in content_type
+                or candidate_url.lower().endswith(_IMAGE_EXTENSIONS)
+            )
     except requests.RequestException:
         return False
 
 
-def resolve_favicon(site_url: str, timeout: int = 4) -> Optional[str]:
-    normalized = normalize_url(site_url)
-    if not normalized:
-        return None
+def _page_decoder(encoding: Optional[str]):
+    # incremental so a multi-byte character split across chunks still decodes
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
 
-    parsed = urlparse(normalized)
-    if not parsed.netloc:
-        return None
 
+def _discover_icon_links(page_url: str, timeout: float,
+                         expires: float) -> tuple[list[str], Optional[str], bool]:
+    # fetch the page and parse out any <link rel="icon"> tags
+    # returns the absolute hrefs, the post-redirect origin (None if the fetch failed) and whether the
+    # server couldn't be reached at all (connect error or timeout) - an error status still counts as reached
+    remaining = _time_left(expires, timeout)
+    if remaining <= 0:
+        return [], None, False
+
+    parser = _IconParser()
+    try:
+        # streamed and parsed chunk by chunk - big spa bundles or endless responses on / are cut off
+        # at </head>, HEAD_MAX_BYTES or the deadline, and the connection is released either way
+        with _http.get(page_url, timeout=remaining, allow_redirects=True, stream=True) as response:
+            response.raise_for_status()
+            decoder = _page_decoder(response.encoding)
+            read = 0
+            for chunk in response.iter_content(chunk_size=HEAD_CHUNK_BYTES):
+                chunk = chunk[:HEAD_MAX_BYTES - read]
+                read += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if parser.done or read >= HEAD_MAX_BYTES or time.monotonic() >= expires:
+                    break
+            page_url = response.url
+    except (requests.ConnectionError, requests.Timeout):
+        return [], None, True
+    except requests.RequestException:
+        return [], None, False
+
+    # use the post-redirect url as the base for resolving relative icon hrefs
+    final_parsed = urlparse(page_url)
+    final_origin = f"{final_parsed.scheme}://{final_parsed.netloc}"
+    return [urljoin(page_url, href) for href in parser.hrefs], final_origin, False
+
+
+def resolve_favicon(site_url: str, timeout: float = 4, deadline: float = 8,
+                    fallback_ok: bool = False) -> Optional[str]:
+    # timeout caps each individual http call, deadline caps the whole resolution
+    # fallback_ok says the origin's /favicon.ico is already known to be good, so it isn't probed again
+    return probe_favicon(site_url, timeout, deadline, fallback_ok)[0]
+
+
+def probe_favicon(site_url: str, timeout: float = 4, deadline: float = 8,
+                  fallback_ok: bool = False) -> tuple[Optional[str], bool]:
+    # resolve_favicon, plus whether the site itself was unreachable rather than just without an icon
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        normalized = normalize_url(site_url)
+        parsed = urlparse(normalized)
+        if not normalized or not parsed.netloc:
+            outcome = "invalid_url"
+            return None, False
+
+        resolved, unreachable = _resolve_favicon(normalized, parsed, timeout, deadline, fallback_ok)
+        if resolved:
+            outcome = "found"
+        else:
+            outcome = "unreachable" if unreachable else "not_found"
+        return resolved, unreachable
+    finally:
+        FAVICON_RESOLUTIONS.observe(time.perf_counter() - started, outcome)
+
+
+def _resolve_favicon(normalized: str, parsed, timeout: float, deadline: float,
+                     fallback_ok: bool) -> tuple[Optional[str], bool]:
+    expires = time.monotonic() + deadline
     base_origin = f"{parsed.scheme}://{parsed.netloc}"
+    base_fallback = urljoin(base_origin, "/favicon.ico")
+
+    # the /favicon.ico fallback doesn't depend on the page, so start probing it while we fetch the html
+    if fallback_ok:
+        early = Future()
+        early.set_result(True)
+    else:
+        early = _probe_pool.submit(_validate_image, base_fallback, timeout, expires)
+
+    hrefs, final_origin, unreachable = _discover_icon_links(normalized, timeout, expires)
+
+    # candidates in priority order: declared icons, then /favicon.ico on the final and original origin
     candidates = []
-    # track the final origin separately in case the site redirects to a different host
-    final_origin = base_origin
+    for candidate in hrefs + [urljoin(final_origin or base_origin, "/favicon.ico"), base_fallback]:
+        if candidate and candidate not in candidates:
+            candidates.append(candidate)
+
+    futures = {}
+    for index, candidate in enumerate(candidates):
+        future = early if candidate == base_fallback else _probe_pool.submit(
+            _validate_image, candidate, timeout, expires)
+        futures[future] = index
 
+    results = [None] * len(candidates)
+    best = 0
     try:
-        # fetch the page and parse out any <link rel="icon"> tags
-        response = requests.get(
-            normalized, timeout=timeout, allow_redirects=True, verify=False)
-        response.raise_for_status()
-
-        # use the post-redirect url as the base for resolving relative icon hrefs
-        final_parsed = urlparse(response.url)
-        final_origin = f"{final_parsed.scheme}://{final_parsed.netloc}"
-
-        parser = _IconParser()
-        # cap at 150k chars - enough to find the <head> without loading massive pages
-        parser.feed(response.text[:150000])
-        for href in parser.hrefs:
-            candidates.append(urljoin(response.url, href))
-    except requests.RequestException:
-        pass
+        for future in as_completed(futures, timeout=max(0.0, expires - time.monotonic())):
+            results[futures[future]] = future.result()
+            # skip past every higher priority candidate that is known to have failed
+            while best < len(candidates) and results[best] is False:
+                best += 1
+            # the best remaining candidate is confirmed - no need to wait on the rest
+            if best < len(candidates) and results[best]:
+                return candidates[best], False
+    except FuturesTimeout:
+        # out of time - settle for the highest priority candidate that did validate
+        for candidate, ok in zip(candidates, results):
+            if ok:
+                return candidate, False
+    finally:
+        for future in futures:
+            future.cancel()
+
+    return None, unreachable
 
-    # always fall back to /favicon.ico on both the final and original origin
-    candidates.append(urljoin(final_origin, "/favicon.ico"))
-    if final_origin != base_origin:
-        candidates.append(urljoin(base_origin, "/favicon.ico"))
 
-    seen = set()
-    for candidate in candidates:
-        if not candidate or candidate in seen:
-            continue
-        seen.add(candidate)
-        if _validate_image(candidate, timeout=timeout):
-            return candidate
+def fetch_image(image_url: str, timeout: float = 4, max_bytes: int = 512 * 1024) -> Optional[bytes]:
+    # download an icon over the shared session, giving up if it's bigger than max_bytes
+    try:
+        with _http.get(image_url, timeout=timeout, stream=True) as response:
+            if response.status_code >= 400:
+                return None
+            # trust content-length when present so we dont even start on something oversized
+            declared = response.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                return None
 
-    return None
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=16384):
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    return None
+            return bytes(body)
+    except requests.RequestException:
+        return None
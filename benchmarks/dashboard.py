@@ -0,0 +1,288 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# seeds a scratch database at a few catalogue sizes and times the dashboard, search, api and crud paths
+#
+#   python benchmarks/dashboard.py --sizes 100,5000 --output bench.json
+#   python benchmarks/dashboard.py --sizes 100,5000 --compare bench.json
+#
+# defaults to a throwaway sqlite file - pass --database-url to point it at a local mariadb instead
+# (the database is wiped between sizes, so never point it at real data)
+
+import argparse
+import html
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description="WebUI Manager benchmarks")
+    parser.add_argument("--sizes", default="100,5000",
+                        help="comma separated WebUI counts to seed, e.g. 100,5000,50000")
+    parser.add_argument("--hosts", type=int, default=50, help="hosts to spread WebUIs across")
+    parser.add_argument("--categories", type=int, default=20, help="categories to tag WebUIs with")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per read scenario")
+    parser.add_argument("--writes", type=int, default=50, help="creates and edits per size")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for the generated data")
+    parser.add_argument("--database-url", help="SQLAlchemy URL of a scratch database (default: temp sqlite)")
+    parser.add_argument("--output", help="write results as json to this file")
+    parser.add_argument("--compare", help="previous json output to compare against")
+    return parser.parse_args()
+
+
+ARGS = _parse_args()
+
+# config is read from the environment at import time, so set it up before importing the app
+_scratch = tempfile.mkdtemp(prefix="webui-bench-")
+os.environ["DATABASE_URL"] = ARGS.database_url or f"sqlite:///{_scratch}/bench.db"
+os.environ["DATA_DIR"] = _scratch
+os.environ["AUTO_MIGRATE"] = "true"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["DB_QUERY_STATS"] = "false"
+# background probes of the made up hosts would only add noise
+os.environ["HEALTH_CHECKS_ENABLED"] = "false"
+sys.path.insert(0, str(ROOT))
+
+import sqlalchemy  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.cache import render_cache  # noqa: E402
+from app.cards import rebuild_cards  # noqa: E402
+from app.jobs import favicon_jobs  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
+from app.models import Category, Host, User, WebUI, db, webui_categories  # noqa: E402
+from app.search import rebuild_index  # noqa: E402
+
+WORDS = ("proxmox", "grafana", "jellyfin", "sonarr", "radarr", "pihole", "nextcloud", "gitea",
+         "portainer", "traefik", "homeassistant", "unifi", "truenas", "vaultwarden", "syncthing")
+_CARDS_URL_RE = re.compile(r'data-cards-url="([^"]+)"')
+
+
+def _seed(size: int, rng: random.Random) -> None:
+    # bulk insert through core so seeding 50k rows takes seconds, not minutes
+    db.drop_all()
+    run_migrations()
+
+    user = User(username="bench")
+    user.set_password("bench")
+    db.session.add(user)
+    db.session.execute(db.insert(Host), [
+        {"name": f"node-{i:03d}", "description": f"host {i}"} for i in range(ARGS.hosts)])
+    db.session.execute(db.insert(Category), [
+        {"name": f"category-{i:02d}", "description": ""} for i in range(ARGS.categories)])
+
+    now = datetime.now(timezone.utc)
+    batch = []
+    links = []
+    for i in range(1, size + 1):
+        word = rng.choice(WORDS)
+        batch.append({
+            "id": i,
+            "name": f"{word} {i}",
+            "url": f"http://{word}-{i}.lan:{rng.randint(1024, 65535)}",
+            "description": f"{word} instance {i} on the {rng.choice(WORDS)} network",
+            # one in ten without a host so the unassigned group gets exercised too
+            "host_id": rng.randint(1, ARGS.hosts) if i % 10 else None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        for category_id in rng.sample(range(1, ARGS.categories + 1), rng.randint(0, 3)):
+            links.append({"webui_id": i, "category_id": category_id})
+        if len(batch) >= 2000:
+            db.session.execute(db.insert(WebUI), batch)
+            batch.clear()
+    if batch:
+        db.session.execute(db.insert(WebUI), batch)
+    if links:
+        db.session.execute(webui_categories.insert(), links)
+    db.session.commit()
+    rebuild_index()
+    rebuild_cards()
+
+
+class _QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _stats(samples: list[float], queries: list[int]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "queries": round(statistics.fmean(queries), 1),
+    }
+
+
+def _time_get(client, counter, path, repeat, cached=False) -> dict:
+    samples, queries = [], []
+    client.get(path)  # warm up templates, pool and (if enabled) the render cache
+    for _ in range(repeat):
+        if not cached:
+            render_cache.clear()
+        before = counter.count
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+        assert response.status_code == 200, (path, response.status_code)
+    return _stats(samples, queries)
+
+
+def _time_full_dashboard(client, counter, repeat) -> dict:
+    # the header page plus every group's cards, i.e. what scrolling through the whole dashboard costs
+    samples, queries = [], []
+    for _ in range(repeat):
+        render_cache.clear()
+        before = counter.count
+        started = time.perf_counter()
+        page = client.get("/dashboard").get_data(as_text=True)
+        for url in _CARDS_URL_RE.findall(page):
+            response = client.get(html.unescape(url))
+            assert response.status_code == 200, (url, response.status_code)
+        samples.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+    return _stats(samples, queries)
+
+
+def _time_writes(client, counter, size, rng) -> dict:
+    create_samples, create_queries = [], []
+    for i in range(ARGS.writes):
+        before = counter.count
+        started = time.perf_counter()
+        response = client.post("/webuis/new", data={
+            "name": f"bench {i}",
+            "url": f"http://bench-{i}.lan",
+            "host_id": str(rng.randint(1, ARGS.hosts)),
+            "category_ids": [str(rng.randint(1, ARGS.categories))],
+        })
+        create_samples.append((time.perf_counter() - started) * 1000)
+        create_queries.append(counter.count - before)
+        assert response.status_code == 302, response.status_code
+
+    edit_samples, edit_queries = [], []
+    for i in range(ARGS.writes):
+        webui_id = rng.randint(1, size)
+        before = counter.count
+        started = time.perf_counter()
+        response = client.post(f"/webuis/{webui_id}/edit", data={
+            "name": f"edited {i}",
+            "url": f"http://edited-{webui_id}.lan",
+            "host_id": str(rng.randint(1, ARGS.hosts)),
+            "category_ids": [str(rng.randint(1, ARGS.categories))],
+        })
+        edit_samples.append((time.perf_counter() - started) * 1000)
+        edit_queries.append(counter.count - before)
+        assert response.status_code == 302, response.status_code
+
+    return {"create": _stats(create_samples, create_queries), "edit": _stats(edit_samples, edit_queries)}
+
+
+def _compare(results: dict, previous_path: str) -> None:
+    previous = json.loads(Path(previous_path).read_text())["results"]
+    print(f"\n{'size':>7} {'scenario':<22} {'before':>10} {'after':>10} {'change':>8}")
+    for size, scenarios in results.items():
+        for name, stats in scenarios.items():
+            old = previous.get(size, {}).get(name)
+            if not old:
+                continue
+            change = (stats["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0
+            print(f"{size:>7} {name:<22} {old['median_ms']:>9.2f}ms {stats['median_ms']:>9.2f}ms {change:>+7.1f}%")
+
+
+def main() -> None:
+    app = create_app()
+    app.config["TESTING"] = True
+    # favicon resolution is stubbed out - we're timing the app, not the network
+    favicon_jobs.submit = lambda webui_id: True
+
+    with app.app_context():
+        counter = _QueryCounter(db.engine)
+        dialect = db.engine.dialect.name
+
+    results = {}
+    for size in [int(value) for value in ARGS.sizes.split(",") if value.strip()]:
+        rng = random.Random(ARGS.seed)
+        with app.app_context():
+            started = time.perf_counter()
+            _seed(size, rng)
+            seed_seconds = time.perf_counter() - started
+
+        client = app.test_client()
+        client.post("/login", data={"username": "bench", "password": "bench"})
+        client.get("/dashboard")  # consume the login flash so later requests are plain reads
+
+        repeat = ARGS.repeat
+        scenarios = {
+            "dashboard": _time_get(client, counter, "/dashboard", repeat),
+            "dashboard_cached": _time_get(client, counter, "/dashboard", repeat, cached=True),
+            "dashboard_group_cards": _time_get(client, counter, "/dashboard/hosts/1/cards", repeat),
+            "dashboard_all_groups": _time_full_dashboard(client, counter, repeat),
+            "dashboard_host": _time_get(client, counter, "/dashboard?host_id=1", repeat),
+            "dashboard_category": _time_get(client, counter, "/dashboard?category_id=1", repeat),
+            "dashboard_search": _time_get(client, counter, "/dashboard?q=grafana", repeat),
+            "api_webuis_page": _time_get(client, counter, "/api/webuis?limit=100", repeat),
+            "api_suggest": _time_get(client, counter, "/api/suggest?q=graf", repeat),
+        }
+        scenarios.update(_time_writes(client, counter, size, rng))
+        results[str(size)] = scenarios
+
+        print(f"\n{size} WebUIs (seeded in {seed_seconds:.1f}s)")
+        for name, stats in scenarios.items():
+            print(f"  {name:<22} median {stats['median_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                  f"{stats['queries']:>5} queries")
+
+    output = {
+        "meta": {
+            "version": (ROOT / "VERSION").read_text().strip(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "database": dialect,
+            "hosts": ARGS.hosts,
+            "categories": ARGS.categories,
+            "repeat": ARGS.repeat,
+            "writes": ARGS.writes,
+            "seed": ARGS.seed,
+        },
+        "results": results,
+    }
+    if ARGS.output:
+        Path(ARGS.output).write_text(json.dumps(output, indent=2))
+        print(f"\nResults written to {ARGS.output}")
+    if ARGS.compare:
+        _compare(results, ARGS.compare)
+
+
+if __name__ == "__main__":
+    main()
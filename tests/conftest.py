@@ -0,0 +1,62 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+
+import pytest
+
+# config is read from the environment at import time, so set it up before importing the app
+_scratch = tempfile.mkdtemp(prefix="webui-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}/test.db"
+os.environ["DATA_DIR"] = _scratch
+os.environ["SECRET_KEY"] = "test-secret"
+# each test migrates its own fresh database
+os.environ["AUTO_MIGRATE"] = "false"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["DB_QUERY_STATS"] = "false"
+
+from app import create_app  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
+from app.models import User, db  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def database(app):
+    # a freshly migrated, empty database for every test
+    with app.app_context():
+        db.drop_all()
+        run_migrations()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, database):
+    # logged in as a user that exists, so the api answers instead of asking for setup or a login
+    user = User(username="admin", password_hash="unused")
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user.id
+    return client
+
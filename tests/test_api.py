@@ -0,0 +1,80 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app.api import _decode_cursor, _encode_cursor
+from app.models import Host, WebUI, db
+
+
+def _pages(client, path: str, limit: int, **filters) -> list[list[dict]]:
+    # follow next_cursor until the last page
+    pages = []
+    cursor = None
+    while True:
+        query = {"limit": limit, **filters}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(path, query_string=query)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    assert _decode_cursor(_encode_cursor("grafana", 42)) == ("grafana", 42)
+
+
+def test_keyset_pages_cover_every_row_once(client):
+    # duplicate names make the id the tie breaker across page boundaries
+    names = ["sonarr", "grafana", "grafana", "grafana", "radarr", "gitea", "grafana", "pihole"]
+    db.session.add_all(WebUI(name=name, url=f"http://svc-{i}.lan") for i, name in enumerate(names))
+    db.session.commit()
+    expected = [(row.name, row.id) for row in db.session.execute(
+        db.select(WebUI.name, WebUI.id).order_by(WebUI.name, WebUI.id))]
+
+    pages = _pages(client, "/api/webuis", limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert [(item["name"], item["id"]) for page in pages for item in page] == expected
+
+
+def test_keyset_last_full_page_has_no_cursor(client):
+    # the extra row fetched decides whether there is another page, so an exact fit ends there
+    db.session.add_all(Host(name=f"node-{i}", description="") for i in range(4))
+    db.session.commit()
+
+    pages = _pages(client, "/api/hosts", limit=2)
+
+    assert [[item["name"] for item in page] for page in pages] == [["node-0", "node-1"], ["node-2", "node-3"]]
+
+
+def test_keyset_respects_filters(client):
+    host = Host(name="nas", description="")
+    db.session.add(host)
+    db.session.add_all(WebUI(name=f"app-{i}", url=f"http://app-{i}.lan", host=host if i % 2 else None)
+                       for i in range(7))
+    db.session.commit()
+
+    pages = _pages(client, "/api/webuis", limit=2, host_id=host.id)
+
+    assert [item["name"] for page in pages for item in page] == ["app-1", "app-3", "app-5"]
+
+
+def test_invalid_cursor_is_a_bad_request(client):
+    for cursor in ("not-base64!", _encode_cursor("x", 1)[:-2], "WyJ4IiwieSJd"):
+        response = client.get("/api/webuis", query_string={"cursor": cursor})
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "Invalid cursor."}
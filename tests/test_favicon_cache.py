@@ -0,0 +1,136 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from app import favicon_cache
+from app.favicon_cache import _record, origin_key, page_key, resolve_icon
+from app.models import FaviconOrigin, db
+
+
+@pytest.fixture
+def config(app, database, monkeypatch):
+    monkeypatch.setitem(app.config, "FAVICON_CACHE_TTL", 3600.0)
+    monkeypatch.setitem(app.config, "FAVICON_RETRY_MIN", 60.0)
+    monkeypatch.setitem(app.config, "FAVICON_RETRY_MAX", 600.0)
+    return app.config
+
+
+@pytest.fixture
+def probes(config, monkeypatch):
+    # site url -> (icon, unreachable) the next probe of it returns, and the urls actually probed
+    results = {}
+    probed = []
+
+    def probe_favicon(site_url, timeout, deadline, fallback_ok=False):
+        probed.append(site_url)
+        return results.get(site_url, (None, False))
+
+    monkeypatch.setattr(favicon_cache, "probe_favicon", probe_favicon)
+    # skip the download, hand out the remote url as if it had been stored
+    monkeypatch.setattr(favicon_cache, "_store", lambda resolved: resolved)
+    return results, probed
+
+
+def _row(key: str) -> FaviconOrigin:
+    db.session.expire_all()
+    return db.session.get(FaviconOrigin, key)
+
+
+def _wait(row: FaviconOrigin) -> float:
+    return (row.expires_at - row.checked_at).total_seconds()
+
+
+def test_keys():
+    assert origin_key("NAS.lan:80/admin") == "http://nas.lan"
+    assert origin_key("https://nas.lan:8443/") == "https://nas.lan:8443"
+    assert origin_key("http://nas.lan:port") is None
+    assert page_key("http://proxy.lan/grafana/") == "http://proxy.lan/grafana/"
+    assert page_key("http://proxy.lan") == "http://proxy.lan/"
+
+
+def test_record_backoff_doubles_up_to_the_cap(config):
+    waits = []
+    for _ in range(6):
+        _record("http://dead.lan", None)
+        row = _row("http://dead.lan")
+        waits.append(_wait(row))
+
+    assert waits == [60, 120, 240, 480, 600, 600]
+    assert row.failures == 6
+    assert row.icon_url is None
+
+
+def test_record_hit_resets_the_failures(config):
+    _record("http://flaky.lan/", None)
+    _record("http://flaky.lan/", None)
+    _record("http://flaky.lan/", "/static/favicons/abc.png")
+
+    row = _row("http://flaky.lan/")
+    assert (row.icon_url, row.failures, _wait(row)) == ("/static/favicons/abc.png", 0, 3600)
+
+    _record("http://flaky.lan/", None)
+    assert _wait(_row("http://flaky.lan/")) == 60
+
+
+def test_page_without_icon_does_not_blank_its_neighbours(probes):
+    results, probed = probes
+    results["http://proxy.lan/grafana"] = ("http://proxy.lan/grafana/public/img/fav32.png", False)
+
+    assert resolve_icon("http://proxy.lan/sonarr") is None
+    assert resolve_icon("http://proxy.lan/grafana") == "http://proxy.lan/grafana/public/img/fav32.png"
+    # both cached per page now
+    assert resolve_icon("http://proxy.lan/sonarr") is None
+    assert resolve_icon("http://proxy.lan/grafana") == "http://proxy.lan/grafana/public/img/fav32.png"
+
+    assert probed == ["http://proxy.lan/sonarr", "http://proxy.lan/grafana"]
+    assert _row("http://proxy.lan/sonarr/").failures == 1
+    assert _row("http://proxy.lan") is None
+
+
+def test_unreachable_origin_backs_off_every_page(probes):
+    results, probed = probes
+    results["http://down.lan/a"] = (None, True)
+
+    assert resolve_icon("http://down.lan/a") is None
+    assert resolve_icon("http://down.lan/b") is None
+
+    assert probed == ["http://down.lan/a"]
+    assert _row("http://down.lan").failures == 1
+    assert _row("http://down.lan/a/") is None
+
+
+def test_origin_answering_again_ends_the_backoff(probes):
+    results, _ = probes
+    _record("http://back.lan", None)
+    _record("http://back.lan", None)
+    # the backoff ran out
+    row = _row("http://back.lan")
+    row.expires_at = row.checked_at
+    db.session.commit()
+    results["http://back.lan/"] = ("http://back.lan/logo.svg", False)
+
+    assert resolve_icon("http://back.lan/") == "http://back.lan/logo.svg"
+    assert _row("http://back.lan") is None
+
+
+def test_favicon_ico_fallback_is_shared_by_the_origin(probes):
+    results, _ = probes
+    results["http://box.lan/one"] = ("http://box.lan/favicon.ico", False)
+    results["http://box.lan/two"] = ("http://box.lan/favicon.ico", False)
+
+    assert resolve_icon("http://box.lan/one") == "http://box.lan/favicon.ico"
+    assert _row("http://box.lan").icon_url == "http://box.lan/favicon.ico"
+    assert resolve_icon("http://box.lan/two") == "http://box.lan/favicon.ico"
+    assert _row("http://box.lan/two/").icon_url == "http://box.lan/favicon.ico"
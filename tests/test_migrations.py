@@ -0,0 +1,88 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from sqlalchemy import inspect
+
+from app import migrations
+from app.migrations import MIGRATIONS, run_migrations, schema_version
+from app.models import WebUI, WebUISearch, db
+
+
+@pytest.fixture
+def empty(database):
+    # a database with nothing in it, not even the schema_version table
+    db.drop_all()
+    return database
+
+
+def _applied() -> list[int]:
+    return db.session.scalars(db.select(schema_version.c.version).order_by(schema_version.c.version)).all()
+
+
+def test_versions_are_contiguous():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == list(range(1, len(MIGRATIONS) + 1))
+
+
+def test_fresh_database_applies_every_migration_in_order(empty, monkeypatch):
+    ran = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (version, description, lambda migrate=migrate, version=version: (ran.append(version), migrate()))
+        for version, description, migrate in MIGRATIONS
+    ])
+
+    assert run_migrations() == [version for version, _, _ in MIGRATIONS]
+    assert ran == [version for version, _, _ in MIGRATIONS]
+    assert _applied() == ran
+    assert set(db.metadata.tables) <= set(inspect(db.engine).get_table_names())
+
+
+def test_applied_migrations_are_not_run_again(database):
+    assert _applied() == [version for version, _, _ in MIGRATIONS]
+    assert run_migrations() == []
+
+
+def test_only_missing_migrations_run(database, monkeypatch):
+    # an install from before the last migration picks up just that one
+    last = MIGRATIONS[-1][0]
+    db.session.execute(schema_version.delete().where(schema_version.c.version == last))
+    db.session.commit()
+    ran = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (version, description, lambda version=version: ran.append(version))
+        for version, description, _ in MIGRATIONS
+    ])
+
+    assert run_migrations() == [last]
+    assert ran == [last]
+
+
+def test_baseline_only_creates_the_baseline_tables(empty):
+    migrations._baseline()
+
+    assert set(inspect(db.engine).get_table_names()) == set(migrations._BASELINE_TABLES)
+
+
+def test_search_backfill_sees_existing_rows(empty):
+    # rows written before the search table existed get their documents from migration 2
+    migrations._baseline()
+    db.session.add(WebUI(name="Grafana", url="http://grafana.lan"))
+    db.session.commit()
+    db.session.execute(db.delete(WebUISearch))
+    db.session.commit()
+
+    run_migrations()
+
+    assert "grafana" in db.session.scalar(db.select(WebUISearch.document))
@@ -0,0 +1,96 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from app.models import Category, Host, WebUI, db
+from app.suggest import SuggestIndex
+
+
+@pytest.fixture
+def index(database):
+    media = Host(name="media", description="")
+    monitoring = Category(name="monitoring", description="")
+    db.session.add_all([
+        media,
+        monitoring,
+        WebUI(name="Jellyfin", url="http://media.lan:8096", host=media),
+        WebUI(name="Sonarr", url="http://media.lan:8989", host=media),
+        WebUI(name="Grafana", url="http://grafana.lan:3000", categories=[monitoring]),
+        WebUI(name="Prometheus", url="http://prom.lan:9090", categories=[monitoring]),
+        WebUI(name="Home Assistant", url="http://ha.lan:8123"),
+        WebUI(name="Portainer", url="http://docker.lan:9000/jellyfin-stack"),
+    ])
+    db.session.commit()
+    index = SuggestIndex()
+    index.rebuild()
+    return index
+
+
+def _names(items: list[dict]) -> list[str]:
+    return [item["name"] for item in items]
+
+
+def test_name_prefix_ranks_above_other_matches(index):
+    # "jelly" starts the jellyfin name, but only appears in the portainer url
+    assert _names(index.search("jelly")) == ["Jellyfin", "Portainer"]
+
+
+def test_named_match_ranks_above_webuis_on_it(index):
+    # the host's own name matches, its webuis only through the host - shorter names first among equals
+    items = index.search("media")
+    assert [item["type"] for item in items] == ["host", "webui", "webui"]
+    assert _names(items) == ["media", "Sonarr", "Jellyfin"]
+    assert items[1]["host"] == "media"
+
+
+def test_every_term_has_to_match(index):
+    assert _names(index.search("home assist")) == ["Home Assistant"]
+    assert index.search("home grafana") == []
+
+
+def test_category_names_are_searchable(index):
+    assert _names(index.search("monitoring")) == ["monitoring", "Grafana", "Prometheus"]
+
+
+def test_substring_match(index):
+    # not the start of any word, so only the trigram lookup finds it
+    assert _names(index.search("afan")) == ["Grafana"]
+
+
+def test_typos_match_fuzzily(index):
+    assert _names(index.search("promethues")) == ["Prometheus"]
+    assert _names(index.search("grafanna")) == ["Grafana"]
+
+
+def test_short_terms_only_match_as_prefix(index):
+    assert _names(index.search("ar")) == []
+    assert _names(index.search("so")) == ["Sonarr"]
+
+
+def test_limit(index):
+    assert len(index.search("lan", limit=2)) == 2
+
+
+def test_edits_are_applied_without_a_rebuild(index):
+    webui = db.session.scalar(db.select(WebUI).where(WebUI.name == "Sonarr"))
+    webui.name = "Radarr"
+    db.session.commit()
+    index.put_webui(webui)
+
+    assert index.search("sonarr") == []
+    assert _names(index.search("radarr")) == ["Radarr"]
+
+    index.drop_webui(webui.id)
+    assert index.search("radarr") == []
@@ -0,0 +1,109 @@
+# Copyright 2026 nullata/webui-manager
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from app import transfer
+from app.models import Category, Host, WebUI, db
+from app.transfer import import_records
+
+
+def _records(*records):
+    # (line number, record, parse error) - what iter_records hands import_records
+    return [(line_no, record, None) for line_no, record in enumerate(records, start=1)]
+
+
+def _webuis() -> dict:
+    return {
+        webui.url: webui
+        for webui in db.session.scalars(db.select(WebUI)).unique()
+    }
+
+
+def test_import_creates_webuis_hosts_and_categories(database):
+    summary = import_records(_records(
+        {"name": "Grafana", "url": "grafana.lan:3000", "categories": ["monitoring"]},
+        {"name": "Sonarr", "url": "http://media.lan:8989", "host": "media", "categories": "arr;media"},
+        {"type": "host", "name": "nas", "description": "storage box"},
+    ))
+
+    assert summary["created"] == 2
+    assert summary["updated"] == 0
+    assert summary["errors"] == []
+    webuis = _webuis()
+    # a missing host key is worked out from the url, minus the port
+    assert webuis["http://grafana.lan:3000"].host.name == "grafana.lan"
+    assert webuis["http://media.lan:8989"].host.name == "media"
+    assert sorted(category.name for category in webuis["http://media.lan:8989"].categories) == ["arr", "media"]
+    assert db.session.scalar(db.select(Host.description).where(Host.name == "nas")) == "storage box"
+
+
+def test_import_upserts_on_url(database):
+    import_records(_records({"name": "Old name", "url": "http://svc.lan", "host": "a", "categories": ["x"]}))
+
+    summary = import_records(_records(
+        {"name": "New name", "url": "http://svc.lan", "host": "b", "description": "moved"},
+        # later rows for the same url win field by field
+        {"name": "Newest name", "url": "http://svc.lan", "host": "b", "description": "moved"},
+    ))
+
+    assert summary["created"] == 0
+    assert summary["updated"] == 1
+    webuis = _webuis()
+    assert len(webuis) == 1
+    webui = webuis["http://svc.lan"]
+    assert (webui.name, webui.description, webui.host.name) == ("Newest name", "moved", "b")
+    assert webui.categories == []
+
+
+def test_import_reports_bad_records_and_keeps_the_rest(database):
+    summary = import_records(_records(
+        {"name": "", "url": "http://empty.lan"},
+        {"type": "widget", "name": "what"},
+        {"name": "Fine", "url": "http://fine.lan"},
+    ))
+
+    assert summary["created"] == 1
+    assert summary["errors"] == [(1, "name and url are required"), (2, "unknown record type 'widget'")]
+    assert list(_webuis()) == ["http://fine.lan"]
+
+
+def test_failed_batch_is_rolled_back(database, monkeypatch):
+    # the second batch blows up after its rows were flushed - none of it may survive, and the batches
+    # either side of it still land
+    real_index = transfer.index_webuis
+    calls = []
+
+    def index_webuis(webuis):
+        calls.append(len(webuis))
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        real_index(webuis)
+
+    monkeypatch.setattr(transfer, "index_webuis", index_webuis)
+
+    summary = import_records(_records(
+        {"name": "One", "url": "http://one.lan", "host": "first"},
+        {"name": "Two", "url": "http://two.lan", "host": "first"},
+        {"name": "Three", "url": "http://three.lan", "host": "second", "categories": ["lost"]},
+        {"name": "Four", "url": "http://four.lan", "host": "second"},
+        {"name": "Five", "url": "http://five.lan", "host": "first"},
+    ), batch_size=2)
+
+    assert summary["errors"] == [(3, "batch ending on line 4 failed: boom")]
+    assert summary["created"] == 3
+    assert summary["hosts_created"] == 1
+    assert summary["categories_created"] == 0
+    assert len(summary["favicon_ids"]) == 3
+    assert sorted(_webuis()) == ["http://five.lan", "http://one.lan", "http://two.lan"]
+    assert db.session.scalars(db.select(Host.name)).all() == ["first"]
+    assert db.session.scalars(db.select(Category.name)).all() == []